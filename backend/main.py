@@ -1,8 +1,17 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from routes.debug import debug_router
 from fastapi.middleware.cors import CORSMiddleware
+from services.python_pool import python_pool
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    python_pool.start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(debug_router)
 
@@ -1,11 +1,33 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from services.sanitizer import is_code_safe
-from services.executor import execute_code
-from services.llm_service import generate_fix, explain_code
-from services.llm_fallback import generate_fix_fallback
+from services.static_analyzer import analysis_stats
+from services.sandbox_limits import sandbox_limits
+from services.scratch import scratch_area
+from services.batch_executor import execute_batch
+from services.executor import (
+    execute_code_async,
+    sandbox_scheduler,
+    CPP_COMPILE_PROFILES,
+)
+from services.concurrency import (
+    AdmissionRejected,
+    PooledIterator,
+    admission_controller,
+    llm_threads,
+    run_in_pool,
+)
+from services.compile_cache import compile_cache
+from services.cpp_pch import precompiled_headers
+from services.fix_cache import fix_cache
+from services.explain_cache import explain_cache
+from services.llm_json import parse_tracker
+from services.llm_metrics import latency_tracker
+from services.llm_router import llm_router
 from services.auto_retry_service import auto_retry_service
-from typing import List, Optional, Dict, Any
+from typing import Any, Callable, Dict, List, Optional
+import json
 import time
 
 debug_router = APIRouter(prefix="/api")
@@ -13,24 +35,47 @@ debug_router = APIRouter(prefix="/api")
 MAX_CODE_LENGTH = 5000
 SUPPORTED_LANGUAGES = {"python", "cpp"}
 MAX_RETRY_ATTEMPTS = 5
+MAX_STDIN_LENGTH = 65536
+MAX_BATCH_ITEMS = 64
+MAX_SESSION_PAGE = 200
+MAX_BEAM_WIDTH = 4
 
 
 class DebugRequest(BaseModel):
     language: str = Field(..., min_length=1, max_length=20)
     code: str = Field(..., min_length=1, max_length=MAX_CODE_LENGTH)
+    compile_profile: Optional[str] = Field(default=None, max_length=20)
+    stdin: Optional[str] = Field(default=None, max_length=MAX_STDIN_LENGTH)
+
+
+class BatchItem(BaseModel):
+    code: str = Field(..., min_length=1, max_length=MAX_CODE_LENGTH)
+    stdin: str = Field(default="", max_length=MAX_STDIN_LENGTH)
+    expected_stdout: Optional[str] = Field(default=None, max_length=MAX_STDIN_LENGTH)
+
+
+class BatchExecuteRequest(BaseModel):
+    language: str = Field(..., min_length=1, max_length=20)
+    items: List[BatchItem] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+    compile_profile: Optional[str] = Field(default=None, max_length=20)
 
 
 class AutoRetryRequest(BaseModel):
     language: str = Field(..., min_length=1, max_length=20)
     code: str = Field(..., min_length=1, max_length=MAX_CODE_LENGTH)
     max_attempts: Optional[int] = Field(default=MAX_RETRY_ATTEMPTS, ge=1, le=10)
+    compile_profile: Optional[str] = Field(default=None, max_length=20)
+    beam_width: Optional[int] = Field(default=None, ge=1, le=MAX_BEAM_WIDTH)
 
 
 class AttemptResult(BaseModel):
     attempt_number: int
-    code_used: str
+    code_used: Optional[str] = None
+    code_diff: Optional[str] = None
     execution_result: dict
     ai_fix: Optional[dict]
+    candidates: Optional[List[dict]] = None
+    escalated: Optional[str] = None
     timestamp: float
     success: bool
 
@@ -42,6 +87,7 @@ class AutoRetryResponse(BaseModel):
     total_attempts: int
     execution_time: float
     session_id: str
+    stop_reason: Optional[str] = None
 
 
 class ExplainCodeRequest(BaseModel):
@@ -61,8 +107,32 @@ class ExplainCodeResponse(BaseModel):
     optimizations: List[str]
 
 
-@debug_router.post("/debug")
-async def debug_code(request: DebugRequest):
+def validate_compile_profile(compile_profile: Optional[str]) -> None:
+    if compile_profile is not None and compile_profile not in CPP_COMPILE_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported compile profile. Supported: {', '.join(CPP_COMPILE_PROFILES)}",
+        )
+
+
+def client_key(http_request: Request) -> Optional[str]:
+    """Identify the caller for fair sandbox scheduling."""
+    session_id = http_request.headers.get("x-session-id")
+    if session_id:
+        return session_id[:64]
+    return http_request.client.host if http_request.client else None
+
+
+async def admission_slot():
+    try:
+        async with admission_controller.slot():
+            yield
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+@debug_router.post("/debug", dependencies=[Depends(admission_slot)])
+async def debug_code(request: DebugRequest, http_request: Request):
     language = request.language.lower().strip()
 
     if language not in SUPPORTED_LANGUAGES:
@@ -71,12 +141,20 @@ async def debug_code(request: DebugRequest):
             detail=f"Unsupported language. Supported: {', '.join(SUPPORTED_LANGUAGES)}",
         )
 
-    is_safe, reason = is_code_safe(request.code)
+    validate_compile_profile(request.compile_profile)
+
+    is_safe, reason = is_code_safe(request.code, language)
 
     if not is_safe:
         raise HTTPException(status_code=400, detail=f"Unsafe code detected: {reason}")
 
-    execution_result = execute_code(language, request.code)
+    execution_result = await execute_code_async(
+        language,
+        request.code,
+        request.compile_profile,
+        client_key(http_request),
+        request.stdin,
+    )
 
     ai_suggestion = None
 
@@ -87,7 +165,9 @@ async def debug_code(request: DebugRequest):
             or "Unknown error"
         )
 
-        ai_suggestion = generate_fix(
+        ai_suggestion = await run_in_pool(
+            llm_threads,
+            llm_router.generate_fix,
             language=language,
             code=request.code,
             error=error_text,
@@ -100,7 +180,11 @@ async def debug_code(request: DebugRequest):
     }
 
 
-@debug_router.post("/explain-code", response_model=ExplainCodeResponse)
+@debug_router.post(
+    "/explain-code",
+    response_model=ExplainCodeResponse,
+    dependencies=[Depends(admission_slot)],
+)
 async def explain_my_code(request: ExplainCodeRequest):
     language = request.language.lower().strip()
 
@@ -110,12 +194,14 @@ async def explain_my_code(request: ExplainCodeRequest):
             detail=f"Unsupported language. Supported: {', '.join(SUPPORTED_LANGUAGES)}",
         )
 
-    is_safe, reason = is_code_safe(request.code)
+    is_safe, reason = is_code_safe(request.code, language)
     if not is_safe:
         raise HTTPException(status_code=400, detail=f"Unsafe code detected: {reason}")
 
     try:
-        explanation_result = explain_code(language, request.code)
+        explanation_result = await run_in_pool(
+            llm_threads, llm_router.explain_code, language, request.code
+        )
 
         return ExplainCodeResponse(
             explanation=explanation_result.explanation,
@@ -130,8 +216,12 @@ async def explain_my_code(request: ExplainCodeRequest):
         )
 
 
-@debug_router.post("/auto-retry", response_model=AutoRetryResponse)
-async def auto_retry_debug(request: AutoRetryRequest):
+@debug_router.post(
+    "/auto-retry",
+    response_model=AutoRetryResponse,
+    dependencies=[Depends(admission_slot)],
+)
+async def auto_retry_debug(request: AutoRetryRequest, http_request: Request):
     language = request.language.lower().strip()
 
     if language not in SUPPORTED_LANGUAGES:
@@ -140,13 +230,22 @@ async def auto_retry_debug(request: AutoRetryRequest):
             detail=f"Unsupported language. Supported: {', '.join(SUPPORTED_LANGUAGES)}",
         )
 
-    is_safe, reason = is_code_safe(request.code)
+    validate_compile_profile(request.compile_profile)
+
+    is_safe, reason = is_code_safe(request.code, language)
     if not is_safe:
         raise HTTPException(status_code=400, detail=f"Unsafe code detected: {reason}")
 
     try:
-        session_result = auto_retry_service.run_complete_session(
-            language=language, code=request.code, max_attempts=request.max_attempts
+        session_result = await run_in_pool(
+            llm_threads,
+            auto_retry_service.run_complete_session,
+            language=language,
+            code=request.code,
+            max_attempts=request.max_attempts,
+            compile_profile=request.compile_profile,
+            client_id=client_key(http_request),
+            beam_width=request.beam_width,
         )
 
         attempts = []
@@ -155,8 +254,11 @@ async def auto_retry_debug(request: AutoRetryRequest):
                 AttemptResult(
                     attempt_number=attempt["attempt_number"],
                     code_used=attempt["code_used"],
+                    code_diff=attempt["code_diff"],
                     execution_result=attempt["execution_result"],
                     ai_fix=attempt["ai_fix"],
+                    candidates=attempt.get("candidates"),
+                    escalated=attempt.get("escalated"),
                     timestamp=attempt["timestamp"],
                     success=attempt["success"],
                 )
@@ -169,29 +271,140 @@ async def auto_retry_debug(request: AutoRetryRequest):
             total_attempts=session_result["total_attempts"],
             execution_time=session_result["elapsed_time"],
             session_id=session_result["session_id"],
+            stop_reason=session_result["stop_reason"],
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Auto-retry failed: {str(e)}")
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+class HeldSlotStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that runs `on_close` (e.g. releasing an admission
+    slot) once it is done, however it ends. A generator's own finally
+    block is not enough: if the client is gone before the response
+    starts, the body is never iterated and that block never runs.
+    """
+
+    def __init__(self, content, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self._on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                await self.body_iterator.aclose()
+            finally:
+                self._on_close()
+
+
+@debug_router.post("/auto-retry/stream")
+async def auto_retry_stream(request: AutoRetryRequest, http_request: Request):
+    """
+    Server-sent events variant of /auto-retry: one event per execution
+    result and per attempt as soon as it exists. Disconnecting (or deleting
+    the session) stops the session after the current step.
+    """
+    language = request.language.lower().strip()
+
+    if language not in SUPPORTED_LANGUAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported language. Supported: {', '.join(SUPPORTED_LANGUAGES)}",
         )
 
+    validate_compile_profile(request.compile_profile)
+
+    is_safe, reason = is_code_safe(request.code, language)
+    if not is_safe:
+        raise HTTPException(status_code=400, detail=f"Unsafe code detected: {reason}")
+
+    # The slot is held for the whole stream, so it is taken here rather
+    # than through the admission_slot dependency.
+    try:
+        await admission_controller.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    try:
+        session = auto_retry_service.start_session(
+            language,
+            request.code,
+            request.max_attempts,
+            request.compile_profile,
+            client_key(http_request),
+            request.beam_width,
+        )
     except Exception as e:
+        admission_controller.release()
         raise HTTPException(status_code=500, detail=f"Auto-retry failed: {str(e)}")
 
+    def end_session() -> None:
+        auto_retry_service.cleanup_session(session.session_id)
+        admission_controller.release()
+
+    async def event_stream():
+        events = PooledIterator(llm_threads, auto_retry_service.stream_session(session))
+        try:
+            yield format_sse({"event": "session", "session_id": session.session_id})
+
+            while True:
+                if await http_request.is_disconnected():
+                    break
+
+                try:
+                    event = await events.next()
+                except Exception as e:
+                    yield format_sse(
+                        {"event": "error", "detail": f"Auto-retry failed: {str(e)}"}
+                    )
+                    break
+
+                if event is None:
+                    break
+
+                yield format_sse(event)
+
+        finally:
+            events.close()
+
+    return HeldSlotStreamingResponse(
+        event_stream(),
+        end_session,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @debug_router.get("/retry-sessions")
-async def get_active_retry_sessions():
-    sessions = []
-    for session_id, session in auto_retry_service.active_sessions.items():
-        sessions.append(session.get_session_summary())
+async def get_active_retry_sessions(
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=MAX_SESSION_PAGE),
+):
+    page = auto_retry_service.sessions.list(offset, limit)
 
-    return {"active_sessions": sessions, "count": len(sessions)}
+    return {
+        "active_sessions": page["sessions"],
+        "count": page["total"],
+        "offset": offset,
+        "limit": limit,
+    }
 
 
 @debug_router.get("/retry-sessions/{session_id}")
 async def get_retry_session(session_id: str):
-    session = auto_retry_service.get_session(session_id)
+    summary = auto_retry_service.get_session_summary(session_id)
 
-    if not session:
+    if summary is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    return session.get_session_summary()
+    return summary
 
 
 @debug_router.delete("/retry-sessions/{session_id}")
@@ -204,8 +417,8 @@ async def cleanup_retry_session(session_id: str):
     return {"message": f"Session {session_id} cleaned up successfully"}
 
 
-@debug_router.post("/quick-fix")
-async def quick_fix_code(request: DebugRequest):
+@debug_router.post("/quick-fix", dependencies=[Depends(admission_slot)])
+async def quick_fix_code(request: DebugRequest, http_request: Request):
     language = request.language.lower().strip()
 
     if language not in SUPPORTED_LANGUAGES:
@@ -214,11 +427,19 @@ async def quick_fix_code(request: DebugRequest):
             detail=f"Unsupported language. Supported: {', '.join(SUPPORTED_LANGUAGES)}",
         )
 
-    is_safe, reason = is_code_safe(request.code)
+    validate_compile_profile(request.compile_profile)
+
+    is_safe, reason = is_code_safe(request.code, language)
     if not is_safe:
         raise HTTPException(status_code=400, detail=f"Unsafe code detected: {reason}")
 
-    execution_result = execute_code(language, request.code)
+    execution_result = await execute_code_async(
+        language,
+        request.code,
+        request.compile_profile,
+        client_key(http_request),
+        request.stdin,
+    )
     ai_suggestion = None
 
     if not execution_result["success"]:
@@ -228,35 +449,171 @@ async def quick_fix_code(request: DebugRequest):
             or "Unknown error"
         )
 
-        try:
-            ai_suggestion = generate_fix(
-                language=language,
-                code=request.code,
-                error=error_text,
-            )
-        except Exception:
-            try:
-                ai_suggestion = generate_fix_fallback(
-                    language=language,
-                    code=request.code,
-                    error=error_text,
-                )
-            except Exception as e:
-                ai_suggestion = type(
-                    "obj",
-                    (object,),
-                    {
-                        "explanation": f"All AI services failed: {str(e)}",
-                        "fixed_code": "",
-                        "model_dump": lambda: {
-                            "explanation": f"All AI services failed: {str(e)}",
-                            "fixed_code": "",
-                        },
-                    },
-                )()
+        ai_suggestion = await run_in_pool(
+            llm_threads,
+            llm_router.generate_fix,
+            language=language,
+            code=request.code,
+            error=error_text,
+        )
 
     return {
         "message": "Quick fix completed",
         "result": execution_result,
         "ai_fix": ai_suggestion.model_dump() if ai_suggestion else None,
     }
+
+
+def checked_fix(language: str, ai_fix: Dict[str, Any]) -> Dict[str, Any]:
+    """Withhold a streamed fix whose code fails the safety check."""
+    if ai_fix.get("fixed_code", "").strip():
+        is_safe, reason = is_code_safe(ai_fix["fixed_code"], language)
+        if not is_safe:
+            return {
+                **ai_fix,
+                "fixed_code": "",
+                "patch": None,
+                "rejected": f"Unsafe code detected: {reason}",
+            }
+    return ai_fix
+
+
+async def stream_debug(request: DebugRequest, http_request: Request):
+    """
+    Server-sent events for /debug/stream and /quick-fix/stream: an
+    `execution` event with the run result, then, if it failed,
+    `explanation` events with text deltas as the model writes them and a
+    `fix` event once the whole answer is in and its code has passed
+    is_code_safe(). A provider that fails hands over to the next one with
+    a `fallback` event (see llm_router.stream_fix()); clients should
+    discard the explanation text received so far.
+    """
+    language = request.language.lower().strip()
+
+    if language not in SUPPORTED_LANGUAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported language. Supported: {', '.join(SUPPORTED_LANGUAGES)}",
+        )
+
+    validate_compile_profile(request.compile_profile)
+
+    is_safe, reason = is_code_safe(request.code, language)
+    if not is_safe:
+        raise HTTPException(status_code=400, detail=f"Unsafe code detected: {reason}")
+
+    # The slot is held for the whole stream, as in /auto-retry/stream,
+    # and released by the response.
+    try:
+        await admission_controller.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    async def event_stream():
+        execution_result = await execute_code_async(
+            language,
+            request.code,
+            request.compile_profile,
+            client_key(http_request),
+            request.stdin,
+        )
+        yield format_sse({"event": "execution", "result": execution_result})
+
+        if execution_result["success"]:
+            yield format_sse({"event": "complete"})
+            return
+
+        error_text = (
+            execution_result.get("stderr")
+            or execution_result.get("error")
+            or "Unknown error"
+        )
+
+        ai_fix = None
+        events = PooledIterator(
+            llm_threads, llm_router.stream_fix(language, request.code, error_text)
+        )
+        try:
+            while ai_fix is None:
+                if await http_request.is_disconnected():
+                    return
+
+                event = await events.next()
+                if event is None:
+                    break
+                if event["event"] == "fix":
+                    ai_fix = event["fix"].model_dump()
+                else:
+                    yield format_sse(event)
+        finally:
+            events.close()
+
+        if ai_fix is not None:
+            ai_fix = checked_fix(language, ai_fix)
+            yield format_sse({"event": "fix", "ai_fix": ai_fix})
+        yield format_sse({"event": "complete"})
+
+    return HeldSlotStreamingResponse(
+        event_stream(),
+        admission_controller.release,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@debug_router.post("/debug/stream")
+async def debug_code_stream(request: DebugRequest, http_request: Request):
+    """Streaming variant of /debug (see stream_debug)."""
+    return await stream_debug(request, http_request)
+
+
+@debug_router.post("/quick-fix/stream")
+async def quick_fix_stream(request: DebugRequest, http_request: Request):
+    """Streaming variant of /quick-fix (see stream_debug)."""
+    return await stream_debug(request, http_request)
+
+
+@debug_router.post("/batch-execute", dependencies=[Depends(admission_slot)])
+async def batch_execute(request: BatchExecuteRequest, http_request: Request):
+    language = request.language.lower().strip()
+
+    if language not in SUPPORTED_LANGUAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported language. Supported: {', '.join(SUPPORTED_LANGUAGES)}",
+        )
+
+    validate_compile_profile(request.compile_profile)
+
+    for code in {item.code for item in request.items}:
+        is_safe, reason = is_code_safe(code, language)
+        if not is_safe:
+            raise HTTPException(status_code=400, detail=f"Unsafe code detected: {reason}")
+
+    batch_result = await execute_batch(
+        language,
+        [item.model_dump() for item in request.items],
+        request.compile_profile,
+        client_key(http_request),
+    )
+
+    return {"message": "Batch execution completed", **batch_result}
+
+
+@debug_router.get("/stats")
+async def get_service_stats():
+    return {
+        "admission": admission_controller.stats(),
+        "sandboxes": sandbox_scheduler.stats(),
+        "compile_cache": compile_cache.stats(),
+        "precompiled_headers": precompiled_headers.stats(),
+        "fix_cache": fix_cache.stats(),
+        "explain_cache": explain_cache.stats(),
+        "llm_latency": latency_tracker.stats(),
+        "llm_router": llm_router.stats(),
+        "llm_parsing": parse_tracker.stats(),
+        "static_analysis": analysis_stats(),
+        "sandbox_limits": sandbox_limits.stats(),
+        "scratch": scratch_area.stats(),
+        "retry_sessions": auto_retry_service.sessions.stats(),
+    }
@@ -3,31 +3,151 @@ Auto-retry debugging service.
 Implements the Error → Fix → Re-run automatically → Confirm flow.
 """
 
+import hashlib
 import time
-from typing import List, Optional, Dict, Any
+import uuid
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from services.config import (
+    LLM_FIX_FORMAT,
+    LLM_HEDGE_MODE,
+    LLM_HEDGE_DELAY,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_HEDGE_MAX_DELAY,
+    RETRY_SESSION_BACKEND,
+    RETRY_SESSION_PATH,
+    RETRY_SESSION_MAX,
+    RETRY_SESSION_TTL,
+    RETRY_BEAM_WIDTH,
+    RETRY_STALL_ATTEMPTS,
+)
+from services.concurrency import execution_threads, llm_call_threads
+from services.llm_metrics import latency_tracker
 from services.sanitizer import is_code_safe
+from services.session_store import (
+    MemorySessionStore,
+    SessionStore,
+    SQLiteSessionStore,
+)
+from services.error_compactor import compact_error
 from services.executor import execute_code
-from services.llm_service import generate_fix, BugFixResponse
-from services.llm_fallback import generate_fix_fallback
+from services.fix_cache import make_fix_key, normalize_code, normalize_error
+from services.fix_patch import make_diff
+from services.llm_router import ALL_FAILED_PREFIX, llm_router
+from services.llm_service import BugFixResponse
+
+BEAM_TEMPERATURES = (0.6, 1.0)
+BEAM_LIMIT_ERRORS = {
+    "Execution timed out",
+    "CPU time limit exceeded",
+    "Memory limit exceeded",
+    "Output file size limit exceeded",
+}
 
 
 class RetrySession:
     """Tracks state for an auto-retry debugging session."""
 
-    def __init__(self, language: str, initial_code: str, max_attempts: int = 5):
+    __slots__ = (
+        "language",
+        "initial_code",
+        "max_attempts",
+        "compile_profile",
+        "current_code",
+        "last_attempt_code",
+        "beam_width",
+        "prepared_run",
+        "attempts",
+        "start_time",
+        "updated_at",
+        "session_id",
+        "client_id",
+        "is_complete",
+        "success",
+        "cancelled",
+        "seen_states",
+        "tried_code",
+        "last_error_key",
+        "error_streak",
+        "escalated",
+        "stop_reason",
+    )
+
+    def __init__(
+        self,
+        language: str,
+        initial_code: str,
+        max_attempts: int = 5,
+        compile_profile: Optional[str] = None,
+        client_id: Optional[str] = None,
+        beam_width: int = 1,
+    ):
         self.language = language.lower().strip()
         self.initial_code = initial_code
         self.max_attempts = max_attempts
+        self.compile_profile = compile_profile
         self.current_code = initial_code
+        self.last_attempt_code = None
+        self.beam_width = beam_width
+        # (code, execution_result) of a beam candidate that already ran
+        self.prepared_run = None
         self.attempts = []
         self.start_time = time.time()
-        self.session_id = f"retry_{int(self.start_time * 1000)}"
+        self.updated_at = self.start_time
+        self.session_id = f"retry_{uuid.uuid4().hex}"
+        self.client_id = client_id or self.session_id
         self.is_complete = False
         self.success = False
+        self.cancelled = False
+        # Loop detection: hashes of failed (code, error) states, of every
+        # code version tried, and how long the error has stayed the same.
+        self.seen_states = set()
+        self.tried_code = {_code_key(self.language, initial_code)}
+        self.last_error_key = None
+        self.error_streak = 0
+        self.escalated = False
+        self.stop_reason = None
+
+    def record_state(self, code: str, error: str) -> Optional[str]:
+        """
+        Remember the state of a failed attempt. Returns "loop_detected" if
+        the same code already failed with the same error, "error_unchanged"
+        if the error has stayed the same for RETRY_STALL_ATTEMPTS attempts
+        in a row, otherwise None.
+        """
+        state = make_fix_key(self.language, code, error)
+        error_key = normalize_error(compact_error(self.language, error, code))
+
+        self.error_streak = (
+            self.error_streak + 1 if error_key == self.last_error_key else 1
+        )
+        self.last_error_key = error_key
+
+        if state in self.seen_states:
+            return "loop_detected"
+        self.seen_states.add(state)
+
+        if RETRY_STALL_ATTEMPTS > 0 and self.error_streak >= RETRY_STALL_ATTEMPTS:
+            return "error_unchanged"
+        return None
+
+    def has_tried(self, code: str) -> bool:
+        return _code_key(self.language, code) in self.tried_code
+
+    def mark_tried(self, code: str) -> None:
+        self.tried_code.add(_code_key(self.language, code))
+
+    def stop(self, reason: str) -> None:
+        """End the session early, recording why."""
+        self.stop_reason = reason
+        self.is_complete = True
 
     def add_attempt(self, attempt_data: Dict[str, Any]) -> None:
         """Add an attempt result to the session."""
         self.attempts.append(attempt_data)
+        self.updated_at = time.time()
         if attempt_data.get("success", False):
             self.success = True
             self.is_complete = True
@@ -43,47 +163,108 @@ class RetrySession:
             "total_attempts": len(self.attempts),
             "is_complete": self.is_complete,
             "success": self.success,
+            "stop_reason": self.stop_reason,
+            "escalated": self.escalated,
             "elapsed_time": time.time() - self.start_time,
             "attempts": self.attempts,
         }
 
+    def get_overview(self) -> Dict[str, Any]:
+        """Summary without code or attempt payloads, for listings."""
+        return {
+            "session_id": self.session_id,
+            "language": self.language,
+            "max_attempts": self.max_attempts,
+            "total_attempts": len(self.attempts),
+            "is_complete": self.is_complete,
+            "success": self.success,
+            "stop_reason": self.stop_reason,
+            "elapsed_time": time.time() - self.start_time,
+        }
+
 
 class AutoRetryService:
     """Service for handling auto-retry debugging sessions."""
 
     def __init__(self):
-        self.active_sessions: Dict[str, RetrySession] = {}
+        self.sessions = _build_session_store()
 
     def start_session(
-        self, language: str, code: str, max_attempts: int = 5
+        self,
+        language: str,
+        code: str,
+        max_attempts: int = 5,
+        compile_profile: Optional[str] = None,
+        client_id: Optional[str] = None,
+        beam_width: Optional[int] = None,
     ) -> RetrySession:
         """Start a new auto-retry session."""
-        session = RetrySession(language, code, max_attempts)
-        self.active_sessions[session.session_id] = session
+        session = RetrySession(
+            language,
+            code,
+            max_attempts,
+            compile_profile,
+            client_id,
+            beam_width or RETRY_BEAM_WIDTH,
+        )
+        self.sessions.add(session)
         return session
 
-    def get_session(self, session_id: str) -> Optional[RetrySession]:
-        """Get an active session by ID."""
-        return self.active_sessions.get(session_id)
+    def get_session_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get an active session's summary by ID, from any worker."""
+        return self.sessions.get_summary(session_id)
 
     def cleanup_session(self, session_id: str) -> bool:
-        """Remove a completed session from memory."""
-        if session_id in self.active_sessions:
-            del self.active_sessions[session_id]
-            return True
-        return False
+        """Remove a session from the store, cancelling it if still running."""
+        return self.sessions.remove(session_id)
+
+    def _checkpoint(self, session: RetrySession) -> None:
+        """Publish progress; a session that is no longer stored stops."""
+        if not self.sessions.save(session):
+            session.cancelled = True
 
     def execute_attempt(
         self, session: RetrySession, attempt_number: int
     ) -> Dict[str, Any]:
         """Execute a single attempt in the retry flow."""
+        attempt_data = self.run_attempt_code(session, attempt_number)
+        self.complete_attempt(session, attempt_data)
+        return attempt_data
+
+    def run_attempt_code(
+        self, session: RetrySession, attempt_number: int
+    ) -> Dict[str, Any]:
+        """Run the session's current code and build the attempt record."""
         attempt_start = time.time()
+        session.updated_at = attempt_start
+
+        prepared, session.prepared_run = session.prepared_run, None
+        if prepared is not None and prepared[0] == session.current_code:
+            # Beam mode already ran this code as the winning candidate.
+            execution_result = prepared[1]
+        else:
+            execution_result = execute_code(
+                session.language,
+                session.current_code,
+                session.compile_profile,
+                session.client_id,
+            )
 
-        execution_result = execute_code(session.language, session.current_code)
+        # Later attempts carry a diff against the code of the attempt before
+        # them. In patch mode that diff replaces their full code (and the
+        # fixed code in the previous ai_fix), keeping records compact.
+        previous_code = session.last_attempt_code
+        session.last_attempt_code = session.current_code
+        compact = _compact_attempts() and previous_code is not None
 
         attempt_data = {
             "attempt_number": attempt_number,
-            "code_used": session.current_code,
+            "code_used": None if compact else session.current_code,
+            "code_diff": (
+                None
+                if previous_code is None
+                else make_diff(previous_code, session.current_code)
+            ),
             "execution_result": execution_result,
             "ai_fix": None,
             "timestamp": attempt_start,
@@ -91,110 +272,515 @@ class AutoRetryService:
             "error_message": None,
         }
 
+        return attempt_data
+
+    def complete_attempt(
+        self, session: RetrySession, attempt_data: Dict[str, Any]
+    ) -> None:
+        """Ask for an AI fix if the run failed, then record the attempt."""
+        execution_result = attempt_data["execution_result"]
+
         if execution_result["success"]:
             session.add_attempt(attempt_data)
-            return attempt_data
+            return
 
         # If failed and not the last attempt, get AI fix
-        if attempt_number < session.max_attempts:
+        if attempt_data["attempt_number"] < session.max_attempts:
             error_text = (
                 execution_result.get("stderr")
                 or execution_result.get("error")
                 or "Unknown error"
             )
 
-            ai_fix = self._get_ai_fix(
-                session.language, session.current_code, error_text
-            )
+            stall = session.record_state(session.current_code, error_text)
+            if stall is not None and not self._escalate(session, attempt_data, stall):
+                session.stop(stall)
+                session.add_attempt(attempt_data)
+                return
+
+            if session.beam_width > 1:
+                ai_fix, candidates = self._explore_candidates(session, error_text)
+                attempt_data["candidates"] = candidates
+            elif session.escalated:
+                ai_fix = self._try_fallback_fix(
+                    session.language, session.current_code, error_text
+                )
+            else:
+                ai_fix = self._get_ai_fix(
+                    session.language, session.current_code, error_text
+                )
+
+            if _is_repeated_fix(session, ai_fix) and self._escalate(
+                session, attempt_data, "repeated_fix"
+            ):
+                # Without a fallback fix, the repeated one (and its
+                # explanation) is what this attempt reports.
+                ai_fix = (
+                    self._try_fallback_fix(
+                        session.language, session.current_code, error_text
+                    )
+                    or ai_fix
+                )
+
+            if _is_repeated_fix(session, ai_fix):
+                # Running it again cannot end differently.
+                ai_fix["repeated"] = True
+                ai_fix.pop("fixed_code")
+                session.stop("loop_detected")
+            else:
+                fixed_code = (ai_fix.get("fixed_code") or "") if ai_fix else ""
+                if fixed_code and _compact_attempts():
+                    # Recorded as the next attempt's code_diff instead.
+                    ai_fix.pop("fixed_code")
+                if fixed_code:
+                    session.current_code = fixed_code
+                    session.mark_tried(fixed_code)
+                elif session.escalated:
+                    # The fallback had no fix either: the next attempt
+                    # would only run the same code again.
+                    session.stop("no_fix")
             attempt_data["ai_fix"] = ai_fix
 
-            if ai_fix and ai_fix.get("fixed_code"):
-                session.current_code = ai_fix["fixed_code"]
-
         session.add_attempt(attempt_data)
-        return attempt_data
+
+    def _escalate(
+        self, session: RetrySession, attempt_data: Dict[str, Any], reason: str
+    ) -> bool:
+        """
+        Switch the rest of the session to the fallback provider. Returns
+        False if that has already happened (or beam mode, which asks both
+        providers anyway, is on), meaning the session should stop.
+        """
+        if session.escalated or session.beam_width > 1:
+            return False
+        session.escalated = True
+        attempt_data["escalated"] = reason
+        return True
 
     def _get_ai_fix(
         self, language: str, code: str, error: str
     ) -> Optional[Dict[str, Any]]:
-        """Get an AI fix, trying main service first, then fallback."""
-        try:
-            # Try main AI service
-            ai_suggestion = generate_fix(language, code, error)
-
-            if ai_suggestion and ai_suggestion.fixed_code.strip():
-                # Validate safety
-                is_safe, reason = is_code_safe(ai_suggestion.fixed_code)
-
-                if is_safe:
-                    return {
-                        "explanation": ai_suggestion.explanation,
-                        "fixed_code": ai_suggestion.fixed_code,
-                        "source": "primary",
-                    }
-                else:
-                    # Try fallback if primary is unsafe
-                    return self._try_fallback_fix(language, code, error)
-            else:
-                # Try fallback if primary fails
-                return self._try_fallback_fix(language, code, error)
-
-        except Exception as e:
-            # Try fallback if primary service throws error
-            fallback_result = self._try_fallback_fix(language, code, error)
-            if fallback_result:
-                return fallback_result
-
-            return {
-                "explanation": f"All AI services failed: {str(e)}",
-                "fixed_code": "",
-                "source": "error",
-            }
+        """Get a safe AI fix from the first provider that gives one."""
+        if LLM_HEDGE_MODE in ("delay", "race"):
+            return self._get_hedged_ai_fix(language, code, error)
 
-    def _try_fallback_fix(
+        suggestion = llm_router.generate_fix(
+            language, code, error, accept=_safe_fix(language)
+        )
+        if suggestion.fixed_code:
+            return _fix_record(suggestion)
+
+        return {
+            "explanation": suggestion.explanation,
+            "fixed_code": "",
+            "source": "error",
+        }
+
+    def _get_hedged_ai_fix(
         self, language: str, code: str, error: str
     ) -> Optional[Dict[str, Any]]:
-        """Try the fallback AI service."""
-        try:
-            fallback_suggestion = generate_fix_fallback(language, code, error)
+        """
+        Hedge the first-ranked provider with the others: they are started
+        once the first has been slower than its usual latency (or straight
+        away in race mode), and the first safe fix wins. A losing call
+        that is already in flight cannot be interrupted; its result is
+        simply discarded. When no provider gives a fix, the result says
+        why, as in _get_ai_fix().
+        """
+        ranked = llm_router.ranked()
+        failures: List[str] = []
+        if len(ranked) < 2:
+            fix = self._try_provider_fix(ranked, language, code, error, failures)
+            return fix if fix is not None else _failed_fix(failures)
+
+        delay = 0.0 if LLM_HEDGE_MODE == "race" else self._hedge_delay(ranked[0])
+
+        primary = llm_call_threads.submit(
+            self._try_provider_fix, ranked[:1], language, code, error, failures
+        )
+        pending = {primary}
+
+        done, _ = wait(pending, timeout=delay)
+        if primary in done and primary.result() is not None:
+            return primary.result()
+
+        pending.add(
+            llm_call_threads.submit(
+                self._try_provider_fix, ranked[1:], language, code, error, failures
+            )
+        )
+        pending -= done
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result is not None:
+                    for other in pending:
+                        other.cancel()
+                    return result
+
+        return _failed_fix(failures)
+
+    def _hedge_delay(self, provider: str) -> float:
+        """How long to give the first-ranked provider before hedging."""
+        if latency_tracker.count(provider) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DELAY
+
+        delay = latency_tracker.percentile(provider, LLM_HEDGE_PERCENTILE)
+        return min(LLM_HEDGE_MAX_DELAY, max(LLM_HEDGE_MIN_DELAY, delay))
+
+    def _try_provider_fix(
+        self,
+        providers: List[str],
+        language: str,
+        code: str,
+        error: str,
+        failures: Optional[List[str]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        A safe fix from one of `providers`, or None, with the reason
+        appended to `failures` if given.
+        """
+        if not providers:
+            return None
 
-            if fallback_suggestion and fallback_suggestion.fixed_code.strip():
-                is_safe, reason = is_code_safe(fallback_suggestion.fixed_code)
+        suggestion = llm_router.generate_fix(
+            language, code, error, providers=providers, accept=_safe_fix(language)
+        )
+        if suggestion.fixed_code:
+            return _fix_record(suggestion)
 
-                if is_safe:
-                    return {
-                        "explanation": fallback_suggestion.explanation,
-                        "fixed_code": fallback_suggestion.fixed_code,
-                        "source": "fallback",
-                    }
+        if failures is not None:
+            failures.append(suggestion.explanation)
+        return None
 
-            return None
+    def _try_fallback_fix(
+        self, language: str, code: str, error: str
+    ) -> Optional[Dict[str, Any]]:
+        """A safe fix from any provider but the first-ranked one, or None."""
+        return self._try_provider_fix(llm_router.ranked()[1:], language, code, error)
+
+    def _explore_candidates(
+        self, session: RetrySession, error: str
+    ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Beam mode: ask for beam_width candidate fixes at once and run each
+        safe, distinct one as soon as it arrives. The first candidate whose
+        run succeeds wins; if none does, the best-scoring run wins. The
+        winner's run becomes the next attempt's result, so it is not run
+        again. Calls and runs still in flight once a winner is found are
+        left to finish in the background and their results discarded.
+        """
+        started_at = time.monotonic()
+        code = session.current_code
+
+        candidates: List[Dict[str, Any]] = []
+        fixes: Dict[Any, Dict[str, Any]] = {}
+        runs: Dict[Any, Dict[str, Any]] = {}
+        seen_code: Dict[str, int] = {}
+
+        for index, (source, temperature) in enumerate(
+            _beam_plan(session.beam_width)
+        ):
+            candidate = {
+                "index": index,
+                "source": source,
+                "temperature": temperature,
+                "status": "pending",
+            }
+            candidates.append(candidate)
+            future = llm_call_threads.submit(
+                self._request_candidate,
+                source,
+                session.language,
+                code,
+                error,
+                temperature,
+            )
+            fixes[future] = candidate
+
+        winner = best = None
+        best_score = -1
+        pending = set(fixes)
+
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                now = time.monotonic() - started_at
+
+                if future in fixes:
+                    candidate = fixes[future]
+                    candidate["fix_time"] = now
+                    fix = future.result()
+                    if fix is None:
+                        candidate["status"] = "no_fix"
+                        continue
+                    if session.has_tried(fix["fixed_code"]):
+                        candidate["status"] = "repeated"
+                        continue
+                    if fix["fixed_code"] in seen_code:
+                        candidate["status"] = "duplicate"
+                        candidate["duplicate_of"] = seen_code[fix["fixed_code"]]
+                        continue
+
+                    seen_code[fix["fixed_code"]] = candidate["index"]
+                    candidate["fix"] = fix
+                    candidate["status"] = "running"
+                    run = execution_threads.submit(
+                        execute_code,
+                        session.language,
+                        fix["fixed_code"],
+                        session.compile_profile,
+                        session.client_id,
+                    )
+                    runs[run] = candidate
+                    pending.add(run)
+                    continue
+
+                candidate = runs[future]
+                result = future.result()
+                candidate["execution_result"] = result
+                candidate["finish_time"] = now
+                candidate["status"] = "succeeded" if result["success"] else "failed"
+
+                score = _candidate_score(result)
+                if score > best_score:
+                    best_score = score
+                    best = candidate
+                if result["success"] and winner is None:
+                    winner = candidate
+
+        for future in pending:
+            future.cancel()
+        for candidate in candidates:
+            if candidate["status"] in ("pending", "running"):
+                candidate["status"] = "abandoned"
+
+        if winner is None and best_score >= 0:
+            winner = best
+
+        if winner is not None:
+            session.prepared_run = (
+                winner["fix"]["fixed_code"],
+                winner["execution_result"],
+            )
 
-        except Exception:
+        records = [
+            _candidate_record(candidate, code, winner) for candidate in candidates
+        ]
+        if winner is None:
+            return None, records
+        return {**winner["fix"], "source": winner["source"]}, records
+
+    def _request_candidate(
+        self,
+        provider: str,
+        language: str,
+        code: str,
+        error: str,
+        temperature: Optional[float],
+    ) -> Optional[Dict[str, Any]]:
+        """One candidate fix, or None if it is empty, unsafe or failed."""
+        suggestion = llm_router.generate_fix(
+            language,
+            code,
+            error,
+            temperature=temperature,
+            providers=[provider],
+            accept=_safe_fix(language),
+        )
+
+        if not suggestion.fixed_code.strip() or suggestion.fixed_code == code:
             return None
 
-    def run_complete_session(
-        self, language: str, code: str, max_attempts: int = 5
-    ) -> Dict[str, Any]:
-        """Run a complete auto-retry session from start to finish."""
-        session = self.start_session(language, code, max_attempts)
+        return {
+            "explanation": suggestion.explanation,
+            "fixed_code": suggestion.fixed_code,
+        }
 
-        for attempt_num in range(1, max_attempts + 1):
-            self.execute_attempt(session, attempt_num)
+    def stream_session(self, session: RetrySession) -> Iterator[Dict[str, Any]]:
+        """
+        Run a session step by step, yielding an event as soon as each
+        execution result and each recorded attempt exists.
+        Stops early once the session is cancelled and always removes the
+        session when done.
+        """
+        try:
+            for attempt_num in range(1, session.max_attempts + 1):
+                if session.cancelled:
+                    break
 
-            if session.is_complete:
-                break
+                attempt_data = self.run_attempt_code(session, attempt_num)
+                self._checkpoint(session)
+                yield {
+                    "event": "execution",
+                    "attempt_number": attempt_num,
+                    "execution_result": attempt_data["execution_result"],
+                }
 
-        # Mark as complete if we've exhausted attempts
-        if not session.is_complete:
+                if session.cancelled:
+                    break
+
+                self.complete_attempt(session, attempt_data)
+                self._checkpoint(session)
+                yield {"event": "attempt", "attempt": attempt_data}
+
+                if session.is_complete:
+                    break
+
+            # Mark as complete if we've exhausted attempts
             session.is_complete = True
+            if session.stop_reason is None:
+                if session.cancelled:
+                    session.stop_reason = "cancelled"
+                elif session.success:
+                    session.stop_reason = "succeeded"
+                else:
+                    session.stop_reason = "max_attempts"
 
-        result = session.get_session_summary()
+            summary = session.get_session_summary()
+            summary.pop("attempts")
+            summary["cancelled"] = session.cancelled
+            yield {"event": "complete", "session": summary}
 
-        # Clean up the session
-        self.cleanup_session(session.session_id)
+        finally:
+            self.cleanup_session(session.session_id)
 
-        return result
+    def run_complete_session(
+        self,
+        language: str,
+        code: str,
+        max_attempts: int = 5,
+        compile_profile: Optional[str] = None,
+        client_id: Optional[str] = None,
+        beam_width: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Run a complete auto-retry session from start to finish."""
+        session = self.start_session(
+            language, code, max_attempts, compile_profile, client_id, beam_width
+        )
+
+        for _ in self.stream_session(session):
+            pass
+
+        return session.get_session_summary()
+
+
+def _code_key(language: str, code: str) -> str:
+    return hashlib.sha256(normalize_code(language, code).encode("utf-8")).hexdigest()
+
+
+def _compact_attempts() -> bool:
+    """Whether attempts store diffs in place of full code (patch mode)."""
+    return LLM_FIX_FORMAT == "patch"
+
+
+def _failed_fix(failures: List[str]) -> Dict[str, Any]:
+    """The _get_ai_fix() error record for hedged calls that all failed."""
+    reasons = [reason.removeprefix(ALL_FAILED_PREFIX) for reason in failures]
+    return {
+        "explanation": ALL_FAILED_PREFIX
+        + ("; ".join(reasons) or "no LLM provider configured or available"),
+        "fixed_code": "",
+        "source": "error",
+    }
+
+
+def _is_repeated_fix(session: RetrySession, ai_fix: Optional[Dict[str, Any]]) -> bool:
+    """True if the fix only brings back code this session already ran."""
+    return bool(
+        ai_fix and ai_fix.get("fixed_code") and session.has_tried(ai_fix["fixed_code"])
+    )
+
+
+def _safe_fix(language: str) -> Callable[[BugFixResponse], bool]:
+    """Router `accept` check: non-empty code that passes is_code_safe()."""
+
+    def accept(fix: BugFixResponse) -> bool:
+        if not fix.fixed_code.strip():
+            return False
+        is_safe, _ = is_code_safe(fix.fixed_code, language)
+        return is_safe
+
+    return accept
+
+
+def _fix_record(suggestion: BugFixResponse) -> Dict[str, Any]:
+    return {
+        "explanation": suggestion.explanation,
+        "fixed_code": suggestion.fixed_code,
+        "source": suggestion.provider or "cache",
+    }
+
+
+def _beam_plan(width: int) -> List[Tuple[str, Optional[float]]]:
+    """
+    (provider, temperature) for each beam candidate: the available
+    providers in router order at their usual settings first, then all of
+    them again at increasing temperatures.
+    """
+    providers = llm_router.ranked()
+    plan = []
+    if not providers:
+        return plan
+
+    for index in range(width):
+        step = index // len(providers)
+        if step == 0:
+            temperature = None
+        else:
+            temperature = BEAM_TEMPERATURES[min(step, len(BEAM_TEMPERATURES)) - 1]
+        plan.append((providers[index % len(providers)], temperature))
+    return plan
+
+
+def _candidate_score(result: Dict[str, Any]) -> int:
+    """Rank candidate runs: success > runtime error > limit hit > no build."""
+    if result.get("success"):
+        return 3
+    stderr = result.get("stderr") or ""
+    if result.get("error") == "Compilation failed" or "SyntaxError" in stderr:
+        return 0
+    if result.get("error") in BEAM_LIMIT_ERRORS:
+        return 1
+    return 2
+
+
+def _candidate_record(
+    candidate: Dict[str, Any], code: str, winner: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """What the attempt keeps about a candidate: timings, outcome and a diff."""
+    record = {
+        "index": candidate["index"],
+        "source": candidate["source"],
+        "temperature": candidate["temperature"],
+        "status": candidate["status"],
+        "chosen": candidate is winner,
+        "fix_time": candidate.get("fix_time"),
+        "finish_time": candidate.get("finish_time"),
+    }
+
+    if "duplicate_of" in candidate:
+        record["duplicate_of"] = candidate["duplicate_of"]
+    if "fix" in candidate:
+        record["code_diff"] = make_diff(code, candidate["fix"]["fixed_code"])
+
+    result = candidate.get("execution_result")
+    if result is not None:
+        record["success"] = result["success"]
+        record["error"] = result.get("error")
+        record["run_time"] = result.get("run_time")
+        record["queue_wait_time"] = result.get("queue_wait_time")
+    return record
+
+
+def _build_session_store() -> SessionStore:
+    if RETRY_SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore(
+            RETRY_SESSION_PATH, RETRY_SESSION_MAX, RETRY_SESSION_TTL
+        )
+    return MemorySessionStore(RETRY_SESSION_MAX, RETRY_SESSION_TTL)
 
 
 # Global service instance
@@ -0,0 +1,160 @@
+"""
+Batch execution: run many (code, stdin, expected_stdout) cases at once.
+
+Each distinct source is prepared (compiled, for C++) once, then its cases
+are fanned out over the sandbox pool. Every case gets a verdict and its
+own timings.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from services.concurrency import execution_threads
+from services.executor import PreparedProgram, run_in_sandbox, sandbox_scheduler
+
+TIME_LIMIT_ERRORS = {"Execution timed out", "CPU time limit exceeded"}
+
+
+def normalize_output(text: str) -> str:
+    """Ignore trailing whitespace on each line and trailing blank lines."""
+    return "\n".join(line.rstrip() for line in text.rstrip().splitlines())
+
+
+def verdict_for(result: dict, expected_stdout: Optional[str]) -> str:
+    error = result.get("error")
+
+    if error == "Compilation failed":
+        return "compilation_error"
+    if error in TIME_LIMIT_ERRORS:
+        return "time_limit_exceeded"
+    if error == "Memory limit exceeded":
+        return "memory_limit_exceeded"
+    if not result.get("success"):
+        return "runtime_error"
+    if expected_stdout is None:
+        return "completed"
+    if normalize_output(result.get("stdout", "")) == normalize_output(expected_stdout):
+        return "accepted"
+    return "wrong_answer"
+
+
+def _prepare(program: PreparedProgram, client_id: Optional[str]) -> None:
+    if program.language == "cpp":
+        with sandbox_scheduler.slot(client_id or "anonymous"):
+            program.prepare()
+
+
+def _close_when_idle(programs: List[PreparedProgram], futures: List[Future]) -> None:
+    """
+    Release the programs' build dirs once none of `futures` is running.
+    When the batch is cancelled, compiles and runs already on a worker
+    thread cannot be stopped and may still be using the binary; queued
+    ones are dropped.
+    """
+    for future in futures:
+        future.cancel()
+    running = [future for future in futures if not future.done()]
+
+    def close() -> None:
+        for program in programs:
+            program.close()
+
+    if not running:
+        close()
+        return
+
+    lock = threading.Lock()
+    remaining = [len(running)]
+
+    def finished(_future: Future) -> None:
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            close()
+
+    for future in running:
+        future.add_done_callback(finished)
+
+
+async def execute_batch(
+    language: str,
+    items: List[dict],
+    compile_profile: Optional[str] = None,
+    client_id: Optional[str] = None,
+) -> dict:
+    """
+    Run every item ({"code", "stdin", "expected_stdout"}) and return the
+    per-case results in input order plus a verdict summary.
+    """
+    started_at = time.monotonic()
+
+    programs: Dict[str, PreparedProgram] = {}
+    for item in items:
+        if item["code"] not in programs:
+            programs[item["code"]] = PreparedProgram(
+                language, item["code"], compile_profile
+            )
+
+    program_index = {code: index for index, code in enumerate(programs)}
+
+    # One batch never holds more execution threads than there are
+    # sandboxes, so it cannot crowd other requests out of the pool.
+    fan_out = asyncio.Semaphore(sandbox_scheduler.max_concurrency)
+    in_flight: List[Future] = []
+
+    async def run_tracked(func, *args):
+        # Kept so a cancelled batch can wait for them (see _close_when_idle).
+        future = execution_threads.submit(func, *args)
+        in_flight.append(future)
+        return await asyncio.wrap_future(future)
+
+    async def prepare(program: PreparedProgram) -> None:
+        async with fan_out:
+            await run_tracked(_prepare, program, client_id)
+
+    async def run_case(index: int, item: dict) -> dict:
+        program = programs[item["code"]]
+        async with fan_out:
+            result = await run_tracked(
+                run_in_sandbox,
+                client_id,
+                program.run,
+                item.get("stdin"),
+            )
+
+        return {
+            "index": index,
+            "program": program_index[item["code"]],
+            "verdict": verdict_for(result, item.get("expected_stdout")),
+            **result,
+        }
+
+    try:
+        await asyncio.gather(*(prepare(program) for program in programs.values()))
+        results = await asyncio.gather(
+            *(run_case(index, item) for index, item in enumerate(items))
+        )
+    finally:
+        _close_when_idle(list(programs.values()), in_flight)
+
+    summary: Dict[str, int] = {}
+    for result in results:
+        summary[result["verdict"]] = summary.get(result["verdict"], 0) + 1
+
+    return {
+        "results": results,
+        "summary": summary,
+        "programs": [
+            {
+                "index": index,
+                "compile_time": program.compile_time,
+                "compiled": program.compile_error is None,
+            }
+            for index, program in enumerate(programs.values())
+        ],
+        "total_time": time.monotonic() - started_at,
+    }
@@ -0,0 +1,177 @@
+"""
+Content-addressed on-disk cache of compiled C++ binaries.
+
+Entries are keyed by a hash of the compiler, its flags and the source.
+Successful builds are stored as executables, failed builds as the
+compiler's stderr so a broken snippet is not recompiled either.
+Least recently used entries are evicted once the cache exceeds its size
+budget; a hit refreshes the entry's mtime. Binaries are never run from
+the cache: a hit is hard-linked (or copied) into the caller's build dir,
+so a concurrent eviction, from this or another worker process, cannot
+delete it before it runs.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from typing import List, Optional
+
+from services.config import CPP_CACHE_DIR, CPP_CACHE_MAX_BYTES
+
+FAILURE_SUFFIX = ".err"
+
+
+class CompileCache:
+    """Size-bounded LRU cache of compile results."""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self._counters = {
+            "hits": 0,
+            "failure_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def make_key(self, source: str, compiler: str, flags: List[str]) -> str:
+        digest = hashlib.sha256()
+        digest.update(compiler.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update("\0".join(flags).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(source.encode("utf-8"))
+        return digest.hexdigest()
+
+    def binary_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _failure_path(self, key: str) -> str:
+        return os.path.join(self.root, key + FAILURE_SUFFIX)
+
+    def lookup(self, key: str, target: str) -> Optional[dict]:
+        """
+        Returns:
+            {"binary": target} for a cached successful build, placed at
+            `target` (e.g. in the build dir)
+            {"stderr": text} for a cached compile failure
+            None on a miss
+        """
+        binary_path = self.binary_path(key)
+        failure_path = self._failure_path(key)
+
+        try:
+            os.utime(binary_path)
+            _place(binary_path, target)
+            self._count("hits")
+            return {"binary": target}
+        except OSError:
+            pass
+
+        try:
+            with open(failure_path, "r", encoding="utf-8") as failure_file:
+                stderr = failure_file.read()
+            os.utime(failure_path)
+            self._count("failure_hits")
+            return {"stderr": stderr}
+        except OSError:
+            pass
+
+        self._count("misses")
+        return None
+
+    def store_binary(self, key: str, built_path: str) -> None:
+        """Add a freshly built binary to the cache; `built_path` is kept."""
+        os.makedirs(self.root, exist_ok=True)
+        target = self.binary_path(key)
+        temp_target = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        _place(built_path, temp_target)
+        os.replace(temp_target, target)
+        self._after_store(os.path.getsize(target))
+
+    def store_failure(self, key: str, stderr: str) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        target = self._failure_path(key)
+        temp_target = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_target, "w", encoding="utf-8") as failure_file:
+            failure_file.write(stderr)
+        os.replace(temp_target, target)
+        self._after_store(os.path.getsize(target))
+
+    def _after_store(self, size: int) -> None:
+        with self._lock:
+            self._counters["stores"] += 1
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += size
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> list:
+        entries = []
+        try:
+            with os.scandir(self.root) as scan:
+                for entry in scan:
+                    if not entry.is_file() or entry.name.endswith(".tmp"):
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits its budget."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._counters["evictions"] += 1
+
+        self._total_bytes = total
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            stats["bytes"] = self._total_bytes
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+def _place(source: str, target: str) -> None:
+    """Hard-link `source` to `target`, or copy it across filesystems (tmpfs)."""
+    try:
+        os.link(source, target)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copy2(source, target)
+
+
+compile_cache = CompileCache(CPP_CACHE_DIR, CPP_CACHE_MAX_BYTES)
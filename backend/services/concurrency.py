@@ -0,0 +1,134 @@
+"""
+Keeps blocking work off the asyncio event loop.
+
+Code execution and LLM calls are blocking, so the route handlers hand them
+to bounded thread pools. Admission control caps how many requests are in
+flight and how many may wait for a slot; beyond that requests are rejected
+instead of piling up.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from services.config import (
+    EXECUTION_THREAD_POOL_SIZE,
+    LLM_THREAD_POOL_SIZE,
+    LLM_CALL_THREAD_POOL_SIZE,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_QUEUED_REQUESTS,
+)
+
+execution_threads = ThreadPoolExecutor(
+    max_workers=EXECUTION_THREAD_POOL_SIZE, thread_name_prefix="neurodebug-exec"
+)
+llm_threads = ThreadPoolExecutor(
+    max_workers=LLM_THREAD_POOL_SIZE, thread_name_prefix="neurodebug-llm"
+)
+# Individual provider calls fanned out from code already running on
+# llm_threads (hedged or parallel requests). A separate pool keeps those
+# callers from waiting on their own pool.
+llm_call_threads = ThreadPoolExecutor(
+    max_workers=LLM_CALL_THREAD_POOL_SIZE, thread_name_prefix="neurodebug-llm-call"
+)
+
+
+async def run_in_pool(pool: ThreadPoolExecutor, func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable on `pool` and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+
+
+class PooledIterator:
+    """
+    Steps a blocking generator on a thread pool from async code, e.g. to
+    forward its events as server-sent events.
+
+    When the client goes away, the response task is cancelled while a
+    worker may still be inside next(), and closing the generator from
+    the event loop then would fail with "generator already executing".
+    close() instead queues the close on the pool behind the step in
+    flight, so the generator's cleanup (finally blocks, provider
+    bookkeeping) always runs.
+    """
+
+    def __init__(self, pool: ThreadPoolExecutor, generator: Iterator[Any]):
+        self._pool = pool
+        self._generator = generator
+        self._pending: Optional[Future] = None
+
+    async def next(self, default: Any = None) -> Any:
+        self._pending = self._pool.submit(next, self._generator, default)
+        return await asyncio.wrap_future(self._pending)
+
+    def close(self) -> None:
+        pending = self._pending
+        generator = self._generator
+
+        def close_after_step():
+            if pending is not None:
+                try:
+                    pending.exception()
+                except CancelledError:
+                    pass
+            generator.close()
+
+        self._pool.submit(close_after_step)
+
+
+class AdmissionRejected(Exception):
+    """Raised when both the concurrency limit and the wait queue are full."""
+
+
+class AdmissionController:
+    """Limits concurrent requests and the depth of the queue in front of them."""
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active = 0
+        self._waiting = 0
+        self._rejected = 0
+
+    async def acquire(self) -> None:
+        """Wait for a slot; raises AdmissionRejected if the queue is full."""
+        if self._active >= self.max_concurrency and self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise AdmissionRejected(
+                f"Server busy: {self._active} requests running, {self._waiting} queued"
+            )
+
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+
+    def release(self) -> None:
+        self._active -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "waiting": self._waiting,
+            "rejected": self._rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+admission_controller = AdmissionController(MAX_CONCURRENT_REQUESTS, MAX_QUEUED_REQUESTS)
@@ -0,0 +1,169 @@
+"""
+Runtime configuration for the backend services.
+Every value can be overridden through the environment (or a .env file).
+"""
+
+import os
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return int(value)
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return float(value)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+# LLM models and provider HTTP clients (services/llm_providers.py)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-3-flash-preview")
+LLM_CALL_TIMEOUT = _env_float("LLM_CALL_TIMEOUT", 30.0)
+LLM_CONNECT_TIMEOUT = _env_float("LLM_CONNECT_TIMEOUT", 5.0)
+LLM_MAX_CONNECTIONS = _env_int("LLM_MAX_CONNECTIONS", 32)
+LLM_MAX_KEEPALIVE_CONNECTIONS = _env_int("LLM_MAX_KEEPALIVE_CONNECTIONS", 16)
+LLM_KEEPALIVE_EXPIRY = _env_float("LLM_KEEPALIVE_EXPIRY", 120.0)
+LLM_MAX_RETRIES = _env_int("LLM_MAX_RETRIES", 2)
+
+# Warm Python interpreter pool (services/python_pool.py)
+PYTHON_POOL_SIZE = _env_int("PYTHON_POOL_SIZE", 4)
+PYTHON_POOL_MAX_IDLE = _env_float("PYTHON_POOL_MAX_IDLE", 300.0)
+PYTHON_POOL_FALLBACK = _env_bool("PYTHON_POOL_FALLBACK", True)
+
+# C++ toolchain and compiled-binary cache (services/compile_cache.py)
+CPP_COMPILER = os.getenv("CPP_COMPILER", "g++")
+CPP_CACHE_DIR = os.getenv(
+    "CPP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "neurodebug", "cpp-cache")
+)
+CPP_CACHE_MAX_BYTES = _env_int("CPP_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+
+# C++ compile profiles and precompiled headers (services/cpp_pch.py)
+CPP_COMPILE_PROFILE = os.getenv("CPP_COMPILE_PROFILE", "fast")
+CPP_PCH_ENABLED = _env_bool("CPP_PCH_ENABLED", True)
+CPP_PCH_DIR = os.getenv(
+    "CPP_PCH_DIR", os.path.join(tempfile.gettempdir(), "neurodebug", "pch")
+)
+CPP_PCH_MIN_USES = _env_int("CPP_PCH_MIN_USES", 2)
+CPP_PCH_MAX_SETS = _env_int("CPP_PCH_MAX_SETS", 8)
+CPP_PCH_BUILD_TIMEOUT = _env_float("CPP_PCH_BUILD_TIMEOUT", 120.0)
+
+# Sandbox scheduler (services/executor.py)
+SANDBOX_MAX_CONCURRENCY = _env_int("SANDBOX_MAX_CONCURRENCY", os.cpu_count() or 1)
+
+# Request admission and thread pools (services/concurrency.py). Execution
+# threads wait in the sandbox scheduler for a slot, so there are more of
+# them than slots: the waiting runs then queue per client (round-robin)
+# instead of first come, first served in the pool's own queue.
+MAX_CONCURRENT_REQUESTS = _env_int("MAX_CONCURRENT_REQUESTS", 16)
+MAX_QUEUED_REQUESTS = _env_int("MAX_QUEUED_REQUESTS", 64)
+EXECUTION_THREAD_POOL_SIZE = _env_int(
+    "EXECUTION_THREAD_POOL_SIZE", max(8, 2 * SANDBOX_MAX_CONCURRENCY)
+)
+LLM_THREAD_POOL_SIZE = _env_int("LLM_THREAD_POOL_SIZE", 16)
+LLM_CALL_THREAD_POOL_SIZE = _env_int("LLM_CALL_THREAD_POOL_SIZE", 16)
+
+# Static safety analysis (services/static_analyzer.py)
+STATIC_ANALYSIS_CACHE_SIZE = _env_int("STATIC_ANALYSIS_CACHE_SIZE", 4096)
+
+# Per-execution resource limits (services/sandbox_limits.py); backend is
+# "auto", "rlimit", "cgroup" or "off". The cgroup backend needs a delegated,
+# writable cgroup v2 directory with the memory and pids controllers.
+SANDBOX_LIMITS_BACKEND = os.getenv("SANDBOX_LIMITS_BACKEND", "auto").strip().lower()
+SANDBOX_CPU_TIME_LIMIT = _env_float("SANDBOX_CPU_TIME_LIMIT", 5.0)
+SANDBOX_MEMORY_LIMIT_MB = _env_int("SANDBOX_MEMORY_LIMIT_MB", 256)
+SANDBOX_FILE_SIZE_LIMIT_MB = _env_int("SANDBOX_FILE_SIZE_LIMIT_MB", 8)
+SANDBOX_MAX_PROCESSES = _env_int("SANDBOX_MAX_PROCESSES", 64)
+SANDBOX_CGROUP_ROOT = os.getenv("SANDBOX_CGROUP_ROOT", "")
+
+# Bytes of stdout and of stderr kept per run (services/output_capture.py);
+# longer output keeps its first and last halves
+OUTPUT_CAPTURE_LIMIT = _env_int("OUTPUT_CAPTURE_LIMIT", 64 * 1024)
+
+# Scratch directories for executions (services/scratch.py); an empty root
+# means /dev/shm when writable and not noexec, else the system temp dir
+SCRATCH_ROOT = os.getenv("SCRATCH_ROOT", "")
+SCRATCH_MAX_IDLE_DIRS = _env_int(
+    "SCRATCH_MAX_IDLE_DIRS", SANDBOX_MAX_CONCURRENCY + PYTHON_POOL_SIZE
+)
+SCRATCH_JANITOR_INTERVAL = _env_float("SCRATCH_JANITOR_INTERVAL", 60.0)
+SCRATCH_ORPHAN_AGE = _env_float("SCRATCH_ORPHAN_AGE", 300.0)
+
+# LLM fix cache (services/fix_cache.py); backend is "memory", "sqlite" or "off"
+FIX_CACHE_BACKEND = os.getenv("FIX_CACHE_BACKEND", "memory").strip().lower()
+FIX_CACHE_PATH = os.getenv(
+    "FIX_CACHE_PATH", os.path.join(tempfile.gettempdir(), "neurodebug", "fixes.sqlite3")
+)
+FIX_CACHE_MAX_ENTRIES = _env_int("FIX_CACHE_MAX_ENTRIES", 2048)
+FIX_CACHE_TTL = _env_float("FIX_CACHE_TTL", 24 * 60 * 60)
+
+# Code explanation cache (services/explain_cache.py); "sqlite", "memory" or "off"
+EXPLAIN_CACHE_BACKEND = os.getenv("EXPLAIN_CACHE_BACKEND", "sqlite").strip().lower()
+EXPLAIN_CACHE_PATH = os.getenv(
+    "EXPLAIN_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "neurodebug", "explanations.sqlite3"),
+)
+EXPLAIN_CACHE_MAX_ENTRIES = _env_int("EXPLAIN_CACHE_MAX_ENTRIES", 4096)
+
+# Hedged LLM requests (services/auto_retry_service.py); mode is "off", "delay" or "race"
+LLM_HEDGE_MODE = os.getenv("LLM_HEDGE_MODE", "off").strip().lower()
+LLM_HEDGE_DELAY = _env_float("LLM_HEDGE_DELAY", 8.0)
+LLM_HEDGE_PERCENTILE = _env_float("LLM_HEDGE_PERCENTILE", 90.0)
+LLM_HEDGE_MIN_SAMPLES = _env_int("LLM_HEDGE_MIN_SAMPLES", 20)
+LLM_HEDGE_MIN_DELAY = _env_float("LLM_HEDGE_MIN_DELAY", 0.5)
+LLM_HEDGE_MAX_DELAY = _env_float("LLM_HEDGE_MAX_DELAY", 20.0)
+LLM_LATENCY_WINDOW = _env_int("LLM_LATENCY_WINDOW", 200)
+
+# LLM provider routing (services/llm_router.py): providers in order of
+# preference ("gemini", "openrouter", "stub"), consecutive failures that open
+# a provider's circuit breaker, seconds before an open breaker lets a trial
+# call through, and the weight of the newest sample in the latency/error EWMAs
+LLM_PROVIDERS = [
+    name.strip().lower()
+    for name in os.getenv("LLM_PROVIDERS", "gemini,openrouter").split(",")
+    if name.strip()
+]
+LLM_BREAKER_FAILURES = _env_int("LLM_BREAKER_FAILURES", 3)
+LLM_BREAKER_RESET = _env_float("LLM_BREAKER_RESET", 30.0)
+LLM_EWMA_ALPHA = _env_float("LLM_EWMA_ALPHA", 0.3)
+# Seconds the stub provider (services/llm_stub.py) waits per streamed chunk,
+# to simulate a slow model
+LLM_STUB_DELAY = _env_float("LLM_STUB_DELAY", 0.0)
+
+# Native JSON output (services/llm_json.py): "auto" uses it where known to work
+# (Gemini), "all" for every provider, "off" to rely on the tolerant parser only
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "auto").strip().lower()
+
+# Fix response format (services/fix_patch.py); "full" code or a "patch" (unified diff)
+LLM_FIX_FORMAT = os.getenv("LLM_FIX_FORMAT", "full").strip().lower()
+
+# Auto-retry session store (services/session_store.py); backend is "memory" or
+# "sqlite" (shared by all workers), TTL is idle seconds
+RETRY_SESSION_BACKEND = os.getenv("RETRY_SESSION_BACKEND", "memory").strip().lower()
+RETRY_SESSION_PATH = os.getenv(
+    "RETRY_SESSION_PATH",
+    os.path.join(tempfile.gettempdir(), "neurodebug", "sessions.sqlite3"),
+)
+RETRY_SESSION_MAX = _env_int("RETRY_SESSION_MAX", 256)
+RETRY_SESSION_TTL = _env_float("RETRY_SESSION_TTL", 600.0)
+
+# Auto-retry beam mode (services/auto_retry_service.py): candidate fixes per attempt
+RETRY_BEAM_WIDTH = _env_int("RETRY_BEAM_WIDTH", 1)
+
+# Auto-retry loop detection: consecutive attempts failing with the same
+# normalized error before the session escalates to the fallback or stops
+RETRY_STALL_ATTEMPTS = _env_int("RETRY_STALL_ATTEMPTS", 3)
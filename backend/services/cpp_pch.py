@@ -0,0 +1,185 @@
+"""
+Managed precompiled headers for C++ snippets.
+
+Most submissions start with the same block of standard-library includes.
+The leading `#include <...>` block of a snippet is turned into a header
+that is precompiled once per compile profile and then force-included with
+`-include`. Because the snippet's own includes follow in the same order,
+they become no-ops behind their include guards and the program means
+exactly what it did before, only without re-parsing the library headers.
+
+Headers are built in the background; until a build is ready the snippet
+is compiled the plain way.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import threading
+from typing import Dict, List, Tuple
+
+from services.config import (
+    CPP_COMPILER,
+    CPP_PCH_ENABLED,
+    CPP_PCH_DIR,
+    CPP_PCH_MIN_USES,
+    CPP_PCH_MAX_SETS,
+    CPP_PCH_BUILD_TIMEOUT,
+)
+
+# Include sets worth precompiling as soon as they are first seen.
+PRESET_INCLUDE_SETS = {
+    ("bits/stdc++.h",),
+    ("iostream",),
+    ("iostream", "vector"),
+    ("iostream", "string"),
+    ("iostream", "vector", "algorithm"),
+}
+
+INCLUDE_PATTERN = re.compile(r"^\s*#\s*include\s*<([\w./+-]+)>\s*$")
+COMMENT_PATTERN = re.compile(r"^\s*(//.*|/\*.*\*/\s*)?$")
+
+
+def leading_includes(code: str) -> Tuple[str, ...]:
+    """Return the system headers included before any other code."""
+    headers = []
+
+    for line in code.splitlines():
+        match = INCLUDE_PATTERN.match(line)
+        if match:
+            headers.append(match.group(1))
+        elif not COMMENT_PATTERN.match(line):
+            break
+
+    return tuple(headers)
+
+
+class PrecompiledHeaders:
+    """Builds and hands out precompiled headers per (include set, flags)."""
+
+    def __init__(
+        self,
+        root: str,
+        compiler: str,
+        min_uses: int,
+        max_sets: int,
+        build_timeout: float,
+        enabled: bool = True,
+    ):
+        self.root = root
+        self.compiler = compiler
+        self.min_uses = min_uses
+        self.max_sets = max_sets
+        self.build_timeout = build_timeout
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._uses: Dict[str, int] = {}
+        self._building = set()
+        self._failed = set()
+
+    def _key(self, headers: Tuple[str, ...], flags: List[str]) -> str:
+        payload = "\0".join([self.compiler, *flags, "", *headers])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def flags_for(self, code: str, flags: List[str]) -> List[str]:
+        """
+        Extra compiler flags that make `code` use a precompiled header,
+        or an empty list if none is ready yet.
+        """
+        if not self.enabled:
+            return []
+
+        headers = leading_includes(code)
+        if not headers:
+            return []
+
+        key = self._key(headers, flags)
+        header_path = os.path.join(self.root, key, "pch.h")
+
+        if os.path.exists(header_path + ".gch"):
+            return ["-include", header_path]
+
+        self._maybe_build(key, headers, flags)
+        return []
+
+    def _maybe_build(
+        self, key: str, headers: Tuple[str, ...], flags: List[str]
+    ) -> None:
+        with self._lock:
+            if key in self._building or key in self._failed:
+                return
+
+            self._uses[key] = self._uses.get(key, 0) + 1
+            if headers not in PRESET_INCLUDE_SETS and self._uses[key] < self.min_uses:
+                return
+
+            if self._built_count() + len(self._building) >= self.max_sets:
+                return
+
+            self._building.add(key)
+
+        threading.Thread(
+            target=self._build, args=(key, headers, list(flags)), daemon=True
+        ).start()
+
+    def _built_count(self) -> int:
+        try:
+            return sum(1 for name in os.listdir(self.root) if not name.startswith("."))
+        except OSError:
+            return 0
+
+    def _build(self, key: str, headers: Tuple[str, ...], flags: List[str]) -> None:
+        build_dir = os.path.join(self.root, f".{key}.building")
+        final_dir = os.path.join(self.root, key)
+
+        try:
+            os.makedirs(build_dir, exist_ok=True)
+            with open(os.path.join(build_dir, "pch.h"), "w", encoding="utf-8") as header:
+                for name in headers:
+                    header.write(f"#include <{name}>\n")
+
+            proc = subprocess.run(
+                [self.compiler, *flags, "-x", "c++-header", "pch.h", "-o", "pch.h.gch"],
+                capture_output=True,
+                text=True,
+                timeout=self.build_timeout,
+                cwd=build_dir,
+            )
+
+            if proc.returncode != 0:
+                with self._lock:
+                    self._failed.add(key)
+                return
+
+            os.replace(build_dir, final_dir)
+
+        except Exception:
+            with self._lock:
+                self._failed.add(key)
+
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            with self._lock:
+                self._building.discard(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "built": self._built_count(),
+                "building": len(self._building),
+                "failed": len(self._failed),
+                "max_sets": self.max_sets,
+            }
+
+
+precompiled_headers = PrecompiledHeaders(
+    CPP_PCH_DIR,
+    CPP_COMPILER,
+    CPP_PCH_MIN_USES,
+    CPP_PCH_MAX_SETS,
+    CPP_PCH_BUILD_TIMEOUT,
+    enabled=CPP_PCH_ENABLED,
+)
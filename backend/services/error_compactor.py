@@ -0,0 +1,299 @@
+"""
+Compact error text for LLM prompts and cache keys.
+
+Python tracebacks and GCC diagnostics are parsed into a small structured
+form and rendered back as a few lines:
+
+- temp-file paths become `main.py` / `main.cpp`, library paths their
+  base name;
+- repeated frames (deep recursion) are collapsed into one with a count;
+- only the first error is kept, with a bounded window of frames or
+  notes around it and a count of what was left out;
+- each location in the user's file is followed by the line it points
+  at, taken from the submitted code.
+
+Text that is neither is passed through, trimmed to MAX_CHARS.
+"""
+
+import re
+from typing import List, Optional
+
+TEMP_SOURCE_PATH = re.compile(
+    r"(?:[A-Za-z]:)?[\\/](?:[^\s\"'<>:\\/]+[\\/])*(?:tmp\w+|main)\.(py|cpp)\b"
+)
+
+MAX_FRAMES = 8
+MAX_CONTEXT_LINES = 6
+MAX_LINE_LENGTH = 240
+MAX_CHARS = 3000
+
+USER_FILES = {"main.py", "main.cpp"}
+
+PYTHON_FRAME = re.compile(r'^\s*File "(?P<file>[^"]+)", line (?P<line>\d+)(?:, in (?P<function>.+))?$')
+PYTHON_REPEAT = re.compile(r"^\s*\[Previous line repeated (?P<count>\d+) more times?\]$")
+PYTHON_EXCEPTION = re.compile(r"^(?P<type>[A-Za-z_][\w.]*)(?::\s?(?P<message>.*))?$")
+PYTHON_CHAIN_MARKERS = (
+    "During handling of the above exception, another exception occurred:",
+    "The above exception was the direct cause of the following exception:",
+)
+
+GCC_DIAGNOSTIC = re.compile(
+    r"^(?P<file>[^:\n]+):(?P<line>\d+):(?:(?P<column>\d+):)?\s*"
+    r"(?P<severity>fatal error|error|warning|note):\s*(?P<message>.*)$"
+)
+GCC_REQUIRED_FROM = re.compile(
+    r"^(?P<file>[^:\n]+):(?P<line>\d+):(?:(?P<column>\d+):)?\s+(?P<message>required from .*)$"
+)
+GCC_SCOPE = re.compile(r"^[^:\n]+:\s+(?P<scope>In \w[^:]*.*?):?$")
+GCC_SOURCE_LINE = re.compile(r"^\s*(?:\d+\s*)?\|")
+
+
+def _display_path(path: str) -> str:
+    path = TEMP_SOURCE_PATH.sub(r"main.\1", path.strip())
+    if path in USER_FILES:
+        return path
+    return re.split(r"[\\/]", path)[-1]
+
+
+def _clip(text: str, limit: int = MAX_LINE_LENGTH) -> str:
+    text = text.strip()
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+def _source_line(code: Optional[str], line: int) -> Optional[str]:
+    if not code or line < 1:
+        return None
+    lines = code.splitlines()
+    if line > len(lines):
+        return None
+    return _clip(lines[line - 1])
+
+
+def _trim(text: str) -> str:
+    if len(text) <= MAX_CHARS:
+        return text
+    half = MAX_CHARS // 2
+    return f"{text[:half]}\n... [{len(text) - MAX_CHARS} chars omitted] ...\n{text[-half:]}"
+
+
+def parse_python_traceback(error: str) -> Optional[dict]:
+    """
+    Returns {"exception", "frames", "chained_from"} for the last traceback
+    in `error`, or None if it does not contain one. Frames are
+    {"file", "line", "function", "repeat"} dicts, outermost first.
+    """
+    if "Traceback (most recent call last):" not in error and not re.search(
+        r'^\s*File "[^"]+", line \d+', error, re.MULTILINE
+    ):
+        return None
+
+    blocks = [error]
+    for marker in PYTHON_CHAIN_MARKERS:
+        blocks = [part for block in blocks for part in block.split(marker)]
+
+    def exception_line(block: str) -> Optional[str]:
+        for line in reversed(block.strip().splitlines()):
+            if line and not line[0].isspace() and PYTHON_EXCEPTION.match(line):
+                return line.strip()
+        return None
+
+    frames: List[dict] = []
+    for line in blocks[-1].splitlines():
+        frame = PYTHON_FRAME.match(line)
+        if frame:
+            entry = {
+                "file": _display_path(frame.group("file")),
+                "line": int(frame.group("line")),
+                "function": (frame.group("function") or "").strip() or None,
+                "repeat": 1,
+            }
+            previous = frames[-1] if frames else None
+            if previous and all(previous[k] == entry[k] for k in ("file", "line", "function")):
+                previous["repeat"] += 1
+            else:
+                frames.append(entry)
+            continue
+
+        repeat = PYTHON_REPEAT.match(line)
+        if repeat and frames:
+            frames[-1]["repeat"] += int(repeat.group("count"))
+
+    exception = exception_line(blocks[-1])
+    if exception is None and not frames:
+        return None
+
+    return {
+        "exception": exception or "Unknown error",
+        "frames": frames,
+        "chained_from": exception_line(blocks[0]) if len(blocks) > 1 else None,
+    }
+
+
+def _render_python(parsed: dict, code: Optional[str]) -> str:
+    lines = [_clip(parsed["exception"])]
+    if parsed["chained_from"]:
+        lines.append(f"(raised while handling: {_clip(parsed['chained_from'])})")
+
+    frames = parsed["frames"]
+    # The user's own frames matter most; library frames are counted.
+    user_frames = [frame for frame in frames if frame["file"] in USER_FILES] or frames
+    hidden = len(frames) - len(user_frames)
+
+    window = user_frames[-MAX_FRAMES:]
+    skipped = len(user_frames) - len(window)
+
+    if window:
+        lines.append("Traceback (innermost last):")
+    if skipped:
+        lines.append(f"  ... {skipped} earlier frames omitted")
+
+    for frame in window:
+        location = f"{frame['file']}:{frame['line']}"
+        if frame["function"]:
+            location += f" in {frame['function']}"
+        if frame["repeat"] > 1:
+            location += f" [repeated {frame['repeat']} times]"
+        lines.append(f"  {location}")
+
+        source = _source_line(code, frame["line"]) if frame["file"] in USER_FILES else None
+        if source:
+            lines.append(f"    {source}")
+
+    if hidden:
+        lines.append(f"  ({hidden} library frames omitted)")
+
+    return "\n".join(lines)
+
+
+def parse_gcc_diagnostics(error: str) -> Optional[dict]:
+    """
+    Returns {"diagnostics", "errors", "warnings"} or None if `error` holds
+    no GCC-style diagnostics. Each diagnostic is {"file", "line",
+    "column", "severity", "message", "scope", "context", "chain"}: scope
+    is the "In function ..." header it appeared under, context the notes
+    that followed it and chain the "required from" locations that led to
+    it. Duplicates are dropped.
+    """
+    diagnostics: List[dict] = []
+    seen = set()
+    current = None
+    scope = None
+    chain: List[dict] = []
+
+    for raw_line in error.splitlines():
+        line = raw_line.rstrip()
+        if not line or GCC_SOURCE_LINE.match(line) or line.startswith(
+            ("In file included from", "                 from")
+        ):
+            continue
+
+        scope_match = GCC_SCOPE.match(line)
+        if scope_match:
+            scope = _clip(scope_match.group("scope"))
+            chain = []
+            continue
+
+        required = GCC_REQUIRED_FROM.match(line)
+        if required:
+            # Instantiation chains are printed before the error they explain.
+            chain.append(
+                {
+                    "file": _display_path(required.group("file")),
+                    "line": int(required.group("line")),
+                    "message": _clip(required.group("message")),
+                }
+            )
+            continue
+
+        match = GCC_DIAGNOSTIC.match(line)
+        if match is None:
+            if current is not None:
+                current["context"].append(_clip(line))
+            continue
+
+        file = _display_path(match.group("file"))
+        line_number = int(match.group("line"))
+        severity = match.group("severity")
+        message = _clip(match.group("message"))
+
+        if severity == "note":
+            if current is not None:
+                current["context"].append(f"{file}:{line_number}: note: {message}")
+            continue
+
+        key = (file, line_number, severity, message)
+        if key in seen:
+            current = None
+            chain = []
+            continue
+        seen.add(key)
+
+        current = {
+            "file": file,
+            "line": line_number,
+            "column": int(match.group("column")) if match.group("column") else None,
+            "severity": severity,
+            "message": message,
+            "scope": scope,
+            "context": [],
+            "chain": chain,
+        }
+        chain = []
+        diagnostics.append(current)
+
+    if not diagnostics:
+        return None
+
+    return {
+        "diagnostics": diagnostics,
+        "errors": sum(1 for d in diagnostics if d["severity"] in ("error", "fatal error")),
+        "warnings": sum(1 for d in diagnostics if d["severity"] == "warning"),
+    }
+
+
+def _render_gcc(parsed: dict, code: Optional[str]) -> str:
+    diagnostics = parsed["diagnostics"]
+    errors = [d for d in diagnostics if d["severity"] in ("error", "fatal error")]
+    first = errors[0] if errors else diagnostics[0]
+
+    lines = [f"{first['file']}:{first['line']}: {first['severity']}: {first['message']}"]
+    if first["scope"]:
+        lines.append(f"  ({first['scope']})")
+
+    # Errors inside library headers are reported where the user's code
+    # triggered them: the last user-file step of the instantiation chain.
+    user_line = first["line"] if first["file"] in USER_FILES else None
+    for step in reversed(first["chain"]):
+        if user_line is None and step["file"] in USER_FILES:
+            user_line = step["line"]
+    source = _source_line(code, user_line) if user_line else None
+    if source:
+        lines.append(f"  main.cpp:{user_line}: {source}")
+
+    context = first["context"]
+    lines.extend(f"  {entry}" for entry in context[:MAX_CONTEXT_LINES])
+    if len(context) > MAX_CONTEXT_LINES:
+        lines.append(f"  ... {len(context) - MAX_CONTEXT_LINES} more notes")
+
+    more_errors = len(errors) - (1 if first in errors else 0)
+    if more_errors or parsed["warnings"]:
+        lines.append(f"({more_errors} more errors, {parsed['warnings']} warnings omitted)")
+
+    return "\n".join(lines)
+
+
+def compact_error(language: str, error: str, code: Optional[str] = None) -> str:
+    """Compact form of an error for prompts and cache keys."""
+    if not error:
+        return error
+
+    if language == "python":
+        parsed = parse_python_traceback(error)
+        if parsed is not None:
+            return _trim(_render_python(parsed, code))
+    elif language == "cpp":
+        parsed = parse_gcc_diagnostics(error)
+        if parsed is not None:
+            return _trim(_render_gcc(parsed, code))
+
+    return _trim(TEMP_SOURCE_PATH.sub(r"main.\1", error.strip()))
@@ -1,44 +1,110 @@
 import subprocess
-import tempfile
+import threading
+import time
 import os
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from services.config import (
+    CPP_COMPILER,
+    CPP_COMPILE_PROFILE,
+    OUTPUT_CAPTURE_LIMIT,
+    SANDBOX_MAX_CONCURRENCY,
+)
+from services.compile_cache import compile_cache
+from services.cpp_pch import precompiled_headers
+from services.output_capture import truncate_text
+from services.python_pool import python_pool
+from services.sandbox_limits import sandbox_limits
+from services.scratch import scratch_area
+from services.concurrency import execution_threads, run_in_pool
 
 EXECUTION_TIMEOUT = 3
 
+CPP_COMPILE_PROFILES: Dict[str, List[str]] = {
+    "fast": ["-O0", "-pipe"],
+    "optimized": ["-O2", "-pipe"],
+}
 
-def execute_python(code: str) -> dict:
+
+def execute_python(code: str, stdin: Optional[str] = None) -> dict:
     """
-    Safely execute Python code in a temporary file.
+    Execute Python code, preferring a warm interpreter from the pool.
     """
 
+    if not python_pool.enabled:
+        return _execute_python_cold(code, stdin)
+
     try:
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".py", delete=False
-        ) as temp_file:
-            temp_file.write(code)
-            temp_path = temp_file.name
-
-        result = subprocess.run(
-            ["python", temp_path],
-            capture_output=True,
-            text=True,
-            timeout=EXECUTION_TIMEOUT,
-        )
+        result = python_pool.run(code, EXECUTION_TIMEOUT, stdin)
 
-        return {
-            "success": result.returncode == 0,
-            "stdout": result.stdout,
-            "stderr": result.stderr,
-            "error": None,
-        }
+    except subprocess.TimeoutExpired as e:
+        return _timeout_result(e)
 
-    except subprocess.TimeoutExpired:
+    except Exception as e:
         return {
             "success": False,
             "stdout": "",
             "stderr": "",
-            "error": "Execution timed out",
+            "error": str(e),
         }
 
+    if result is None:
+        return _execute_python_cold(code, stdin)
+
+    return _run_result(result)
+
+
+def _run_result(proc: subprocess.CompletedProcess) -> dict:
+    """
+    Result dict for a finished run, with the resource usage measured by
+    sandbox_limits and a readable error if a limit killed it.
+    """
+    usage = getattr(proc, "usage", {})
+
+    return {
+        "success": proc.returncode == 0,
+        "stdout": proc.stdout,
+        "stderr": proc.stderr,
+        "error": sandbox_limits.describe_violation(proc.returncode, usage),
+        "truncated": getattr(proc, "truncated", False),
+        "peak_rss_kb": usage.get("peak_rss_kb"),
+        "cpu_time": usage.get("cpu_time"),
+    }
+
+
+def _timeout_result(error: subprocess.TimeoutExpired) -> dict:
+    """Result dict for a run that timed out, keeping its partial output."""
+    return {
+        "success": False,
+        "stdout": error.output or "",
+        "stderr": error.stderr or "",
+        "error": "Execution timed out",
+        "truncated": getattr(error, "truncated", False),
+    }
+
+
+def _execute_python_cold(code: str, stdin: Optional[str] = None) -> dict:
+    """
+    Safely execute Python code in a scratch directory.
+    """
+
+    try:
+        with scratch_area.lease() as scratch_dir:
+            with open(
+                os.path.join(scratch_dir, "main.py"), "w", encoding="utf-8"
+            ) as source_file:
+                source_file.write(code)
+
+            result = sandbox_limits.run(
+                ["python", "main.py"], EXECUTION_TIMEOUT, cwd=scratch_dir, input=stdin
+            )
+
+        return _run_result(result)
+
+    except subprocess.TimeoutExpired as e:
+        return _timeout_result(e)
+
     except Exception as e:
         return {
             "success": False,
@@ -47,94 +113,288 @@ def execute_python(code: str) -> dict:
             "error": str(e),
         }
 
-    finally:
-        try:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-        except Exception:
-            pass
-
 
-def execute_cpp(code: str) -> dict:
+def execute_cpp(
+    code: str, compile_profile: Optional[str] = None, stdin: Optional[str] = None
+) -> dict:
     """
     Compile and run C++ code safely.
     """
 
-    source_path = None
-    binary_path = None
+    program = PreparedProgram("cpp", code, compile_profile)
 
     try:
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".cpp", delete=False) as src:
-            src.write(code)
-            source_path = src.name
+        program.prepare()
+        return program.run(stdin)
+    finally:
+        program.close()
+
+
+class PreparedProgram:
+    """
+    A program that can be run many times against different inputs.
+    Python needs no preparation; C++ is compiled once by prepare() into a
+    scratch directory that is held until close().
+    """
+
+    def __init__(
+        self, language: str, code: str, compile_profile: Optional[str] = None
+    ):
+        self.language = language
+        self.code = code
+        self.compile_profile = compile_profile
+        self.binary_path: Optional[str] = None
+        self.compile_error: Optional[dict] = None
+        self.compile_time = 0.0
+        self._build_dir: Optional[str] = None
+
+    def prepare(self) -> Optional[dict]:
+        """
+        Compile the program if needed.
+        Returns the failed result every run() will report, or None.
+        """
+        if self.language != "cpp" or self._build_dir is not None:
+            return self.compile_error
+
+        started_at = time.monotonic()
+        self._build_dir = scratch_area.acquire()
+
+        try:
+            self.binary_path, compile_stderr = _compile_cpp(
+                self.code, self._build_dir, self.compile_profile
+            )
+            if self.binary_path is None:
+                self.compile_error = {
+                    "success": False,
+                    "stdout": "",
+                    "stderr": compile_stderr,
+                    "error": "Compilation failed",
+                }
+
+        except subprocess.TimeoutExpired:
+            self.compile_error = {
+                "success": False,
+                "stdout": "",
+                "stderr": "",
+                "error": "Execution timed out",
+            }
 
-        binary_path = source_path.replace(".cpp", "")
+        except Exception as e:
+            self.compile_error = {
+                "success": False,
+                "stdout": "",
+                "stderr": "",
+                "error": str(e),
+            }
 
-        compile_proc = subprocess.run(
-            ["g++", source_path, "-o", binary_path],
-            capture_output=True,
-            text=True,
-            timeout=EXECUTION_TIMEOUT,
-        )
+        self.compile_time = time.monotonic() - started_at
+        return self.compile_error
 
-        if compile_proc.returncode != 0:
+    def run(self, stdin: Optional[str] = None) -> dict:
+        if self.language == "python":
+            return execute_python(self.code, stdin)
+
+        self.prepare()
+        if self.compile_error is not None:
+            return dict(self.compile_error)
+
+        try:
+            with scratch_area.lease() as scratch_dir:
+                run_proc = sandbox_limits.run(
+                    [self.binary_path], EXECUTION_TIMEOUT, cwd=scratch_dir, input=stdin
+                )
+
+            return _run_result(run_proc)
+
+        except subprocess.TimeoutExpired as e:
+            return _timeout_result(e)
+
+        except Exception as e:
             return {
                 "success": False,
                 "stdout": "",
-                "stderr": compile_proc.stderr,
-                "error": "Compilation failed",
+                "stderr": "",
+                "error": str(e),
             }
 
-        run_proc = subprocess.run(
-            [binary_path],
-            capture_output=True,
-            text=True,
-            timeout=EXECUTION_TIMEOUT,
-        )
+    def close(self) -> None:
+        if self._build_dir is not None:
+            scratch_area.release(self._build_dir)
+            self._build_dir = None
 
-        return {
-            "success": run_proc.returncode == 0,
-            "stdout": run_proc.stdout,
-            "stderr": run_proc.stderr,
-            "error": None,
-        }
 
-    except subprocess.TimeoutExpired:
-        return {
-            "success": False,
-            "stdout": "",
-            "stderr": "",
-            "error": "Execution timed out",
-        }
+def _compile_cpp(
+    code: str, build_dir: str, compile_profile: Optional[str] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Compile C++ code with the given profile in `build_dir`, going through
+    the compiled-binary cache and the precompiled-header layer.
 
-    except Exception as e:
-        return {
-            "success": False,
-            "stdout": "",
-            "stderr": "",
-            "error": str(e),
-        }
+    Returns:
+        (binary_path, None) on success
+        (None, stderr) on compile failure
+    binary_path is in build_dir, also on a cache hit.
+    """
+    flags = CPP_COMPILE_PROFILES[compile_profile or CPP_COMPILE_PROFILE]
+    pch_flags = precompiled_headers.flags_for(code, flags)
+    built_path = os.path.join(build_dir, "main")
+    cache_key = None
 
-    finally:
-        for path in (source_path, binary_path):
-            try:
-                if path and os.path.exists(path):
-                    os.remove(path)
-            except Exception:
-                pass
+    if compile_cache.enabled:
+        # A build with a precompiled header is not guaranteed to be
+        # byte-identical (or to fail with the same messages), so the
+        # header is part of the key.
+        cache_key = compile_cache.make_key(code, CPP_COMPILER, [*flags, *pch_flags])
+        cached = compile_cache.lookup(cache_key, built_path)
+        if cached is not None:
+            return cached.get("binary"), cached.get("stderr")
+
+    source_path = os.path.join(build_dir, "main.cpp")
+
+    with open(source_path, "w", encoding="utf-8") as src:
+        src.write(code)
+
+    compile_proc = subprocess.run(
+        [CPP_COMPILER, *flags, *pch_flags, "main.cpp", "-o", "main"],
+        capture_output=True,
+        text=True,
+        timeout=EXECUTION_TIMEOUT,
+        cwd=build_dir,
+    )
+
+    if compile_proc.returncode != 0:
+        compile_stderr, _ = truncate_text(compile_proc.stderr, OUTPUT_CAPTURE_LIMIT)
+        if cache_key:
+            compile_cache.store_failure(cache_key, compile_stderr)
+        return None, compile_stderr
+
+    if cache_key:
+        compile_cache.store_binary(cache_key, built_path)
+
+    return built_path, None
+
+
+class SandboxScheduler:
+    """
+    Caps the number of sandboxes running at once.
+    Callers beyond the cap wait in one queue per client, and freed slots
+    are handed to those queues round-robin so a single busy client
+    cannot starve everyone else.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._running = 0
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+
+    def acquire(self, client_id: str) -> None:
+        with self._lock:
+            if self._running < self.max_concurrency and not self._queues:
+                self._running += 1
+                return
 
+            ticket = threading.Event()
+            self._queues.setdefault(client_id, deque()).append(ticket)
 
-def execute_code(language: str, code: str) -> dict:
+        ticket.wait()
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._queues:
+                self._running -= 1
+                return
+
+            # Hand the slot straight to the next client in line and move
+            # that client to the back of the rotation.
+            client_id, tickets = self._queues.popitem(last=False)
+            ticket = tickets.popleft()
+            if tickets:
+                self._queues[client_id] = tickets
+
+        ticket.set()
+
+    @contextmanager
+    def slot(self, client_id: str):
+        self.acquire(client_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._running,
+                "queued": sum(len(tickets) for tickets in self._queues.values()),
+                "queued_clients": len(self._queues),
+                "max_concurrency": self.max_concurrency,
+            }
+
+
+sandbox_scheduler = SandboxScheduler(SANDBOX_MAX_CONCURRENCY)
+
+
+def run_in_sandbox(client_id: Optional[str], func, *args) -> dict:
+    """
+    Run `func(*args)`, which returns a result dict, in a sandbox slot and
+    add the queue wait and run time to the result.
+    """
+    queued_at = time.monotonic()
+
+    with sandbox_scheduler.slot(client_id or "anonymous"):
+        started_at = time.monotonic()
+        result = func(*args)
+        finished_at = time.monotonic()
+
+    result.setdefault("peak_rss_kb", None)
+    result.setdefault("cpu_time", None)
+    result.setdefault("truncated", False)
+    result["queue_wait_time"] = started_at - queued_at
+    result["run_time"] = finished_at - started_at
+    return result
+
+
+def execute_code(
+    language: str,
+    code: str,
+    compile_profile: Optional[str] = None,
+    client_id: Optional[str] = None,
+    stdin: Optional[str] = None,
+) -> dict:
     language = language.lower()
 
-    if language == "python":
-        return execute_python(code)
-    elif language == "cpp":
-        return execute_cpp(code)
-    else:
+    if language not in ("python", "cpp"):
         return {
             "success": False,
             "stdout": "",
             "stderr": "",
             "error": f"Unsupported language: {language}",
         }
+
+    if language == "python":
+        return run_in_sandbox(client_id, execute_python, code, stdin)
+
+    return run_in_sandbox(client_id, execute_cpp, code, compile_profile, stdin)
+
+
+async def execute_code_async(
+    language: str,
+    code: str,
+    compile_profile: Optional[str] = None,
+    client_id: Optional[str] = None,
+    stdin: Optional[str] = None,
+) -> dict:
+    """
+    Awaitable execute_code that runs on the execution thread pool
+    instead of blocking the event loop.
+    """
+    return await run_in_pool(
+        execution_threads,
+        execute_code,
+        language,
+        code,
+        compile_profile,
+        client_id,
+        stdin,
+    )
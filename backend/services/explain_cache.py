@@ -0,0 +1,79 @@
+"""
+Persistent cache of code explanations.
+
+Explanations depend on what the code does, not how it is formatted, so
+Python code is keyed on its AST dump and other languages on their
+whitespace-normalized text. Entries are tied to the model that produced
+them: when the configured model changes the cache is cleared.
+"""
+
+import ast
+import hashlib
+from typing import Optional
+
+from services.cache_store import CacheStore, MemoryCacheStore, SQLiteCacheStore
+from services.config import (
+    GEMINI_MODEL,
+    EXPLAIN_CACHE_BACKEND,
+    EXPLAIN_CACHE_PATH,
+    EXPLAIN_CACHE_MAX_ENTRIES,
+)
+from services.fix_cache import normalize_code
+
+MODEL_META_KEY = "model"
+
+
+def canonical_code(language: str, code: str) -> str:
+    if language == "python":
+        try:
+            return ast.dump(ast.parse(code))
+        except (SyntaxError, ValueError):
+            pass
+    return normalize_code(language, code)
+
+
+def make_explain_key(language: str, code: str) -> str:
+    canonical = canonical_code(language, code)
+    return hashlib.sha256(f"{language}\0{canonical}".encode("utf-8")).hexdigest()
+
+
+class ExplainCache:
+    """Stores CodeExplanationResponse payloads for a single model."""
+
+    def __init__(self, store: Optional[CacheStore], model: str):
+        self.store = store
+        self.model = model
+        if store is not None and store.get_meta(MODEL_META_KEY) != model:
+            self.invalidate()
+
+    def lookup(self, language: str, code: str) -> Optional[dict]:
+        if self.store is None:
+            return None
+        return self.store.get(make_explain_key(language, code))
+
+    def store_explanation(self, language: str, code: str, explanation: dict) -> None:
+        if self.store is not None:
+            self.store.set(make_explain_key(language, code), explanation)
+
+    def invalidate(self) -> None:
+        """Drop every cached explanation, e.g. after switching models."""
+        if self.store is None:
+            return
+        self.store.clear()
+        self.store.set_meta(MODEL_META_KEY, self.model)
+
+    def stats(self) -> dict:
+        if self.store is None:
+            return {"enabled": False}
+        return {"enabled": True, "model": self.model, **self.store.stats()}
+
+
+def _build_store() -> Optional[CacheStore]:
+    if EXPLAIN_CACHE_BACKEND == "sqlite":
+        return SQLiteCacheStore(EXPLAIN_CACHE_PATH, EXPLAIN_CACHE_MAX_ENTRIES)
+    if EXPLAIN_CACHE_BACKEND == "memory":
+        return MemoryCacheStore(EXPLAIN_CACHE_MAX_ENTRIES)
+    return None
+
+
+explain_cache = ExplainCache(_build_store(), GEMINI_MODEL)
@@ -0,0 +1,103 @@
+"""
+Cache of LLM bug fixes keyed on (language, code, error).
+
+The same broken snippet tends to arrive many times, so fixes are reused
+instead of asking a model again. Keys are built from whitespace-normalized
+code and the compacted error (see error_compactor) with memory addresses
+removed, so incidental differences between runs still hit.
+"""
+
+import hashlib
+import re
+from typing import Optional
+
+from services.cache_store import CacheStore, MemoryCacheStore, SQLiteCacheStore
+from services.config import (
+    FIX_CACHE_BACKEND,
+    FIX_CACHE_PATH,
+    FIX_CACHE_MAX_ENTRIES,
+    FIX_CACHE_TTL,
+)
+from services.error_compactor import TEMP_SOURCE_PATH, compact_error
+from services.sanitizer import is_code_safe
+
+MEMORY_ADDRESS = re.compile(r"0x[0-9a-fA-F]+")
+
+
+def normalize_code(language: str, code: str) -> str:
+    lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+    if language == "python":
+        # Indentation is significant; only trailing whitespace is noise.
+        lines = [line.rstrip() for line in lines]
+    else:
+        lines = [line.strip() for line in lines]
+
+    return "\n".join(line for line in lines if line)
+
+
+def normalize_error(error: str) -> str:
+    error = TEMP_SOURCE_PATH.sub(r"main.\1", error)
+    error = MEMORY_ADDRESS.sub("0x0", error)
+    lines = [line.rstrip() for line in error.replace("\r\n", "\n").split("\n")]
+    return "\n".join(line for line in lines if line)
+
+
+def make_fix_key(language: str, code: str, error: str) -> str:
+    digest = hashlib.sha256()
+    error = normalize_error(compact_error(language, error, code))
+    for part in (language, normalize_code(language, code), error):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class FixCache:
+    """Looks up and stores fixes; cached code is re-checked before reuse."""
+
+    def __init__(self, store: Optional[CacheStore]):
+        self.store = store
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def lookup(self, language: str, code: str, error: str) -> Optional[dict]:
+        if self.store is None:
+            return None
+
+        key = make_fix_key(language, code, error)
+        cached = self.store.get(key)
+        if cached is None:
+            return None
+
+        is_safe, _ = is_code_safe(cached.get("fixed_code", ""), language)
+        if not is_safe:
+            self.store.delete(key)
+            return None
+
+        return cached
+
+    def store_fix(self, language: str, code: str, error: str, fix: dict) -> None:
+        if self.store is None or not fix.get("fixed_code", "").strip():
+            return
+
+        is_safe, _ = is_code_safe(fix["fixed_code"], language)
+        if is_safe:
+            self.store.set(make_fix_key(language, code, error), fix)
+
+    def stats(self) -> dict:
+        if self.store is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.store.stats()}
+
+
+def _build_store() -> Optional[CacheStore]:
+    if FIX_CACHE_BACKEND == "memory":
+        return MemoryCacheStore(FIX_CACHE_MAX_ENTRIES, FIX_CACHE_TTL)
+    if FIX_CACHE_BACKEND == "sqlite":
+        return SQLiteCacheStore(FIX_CACHE_PATH, FIX_CACHE_MAX_ENTRIES, FIX_CACHE_TTL)
+    return None
+
+
+fix_cache = FixCache(_build_store())
@@ -0,0 +1,183 @@
+"""
+Patch-mode LLM fixes.
+
+Asking the model for the complete corrected code makes it regenerate the
+whole snippet for a one-line fix, and output tokens dominate generation
+latency. In patch mode (LLM_FIX_FORMAT=patch) the model answers with a
+unified diff instead, which is applied here with validation: every
+context and removed line must match the submitted code. A patch that
+does not apply raises PatchError and the caller asks again for full code.
+
+make_diff() is also used to store auto-retry attempts as diffs against
+the previous attempt's code.
+"""
+
+import difflib
+import re
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from services.error_compactor import compact_error
+
+HUNK_HEADER = re.compile(r"^@@\s*(?:-(\d+)(?:,\d+)?\s+\+\d+(?:,\d+)?\s*)?@@")
+CODE_FENCE = re.compile(r"^```[\w+-]*\s*$")
+
+RESPONSE_FORMATS = {
+    "full": """{
+  "explanation": "Brief explanation of the issue and fix",
+  "fixed_code": "Complete corrected code"
+}""",
+    "patch": """{
+  "explanation": "Brief explanation of the issue and fix",
+  "patch": "Unified diff of the fix against the user code, with @@ hunk headers and 2 lines of context"
+}""",
+}
+
+
+class FullFixSchema(BaseModel):
+    explanation: str
+    fixed_code: str
+
+
+class PatchFixSchema(BaseModel):
+    explanation: str
+    patch: str
+
+
+# For providers with native structured output.
+RESPONSE_SCHEMAS = {"full": FullFixSchema, "patch": PatchFixSchema}
+
+
+def build_fix_prompt(language: str, code: str, error: str, fix_format: str) -> str:
+    """The fix prompt shared by every provider."""
+    return f"""
+You are an expert {language} debugger.
+
+User code:
+{code}
+
+Error:
+{compact_error(language, error, code)}
+
+Respond ONLY with valid JSON in this format:
+{RESPONSE_FORMATS[fix_format]}
+
+Do not include markdown or extra text.
+"""
+
+
+class PatchError(ValueError):
+    """The patch is malformed or does not match the code it is applied to."""
+
+
+def make_diff(old: str, new: str) -> str:
+    """Unified diff from `old` to `new`; empty if they are the same."""
+    return "\n".join(
+        difflib.unified_diff(
+            old.splitlines(), new.splitlines(), "a/main", "b/main", lineterm="", n=2
+        )
+    )
+
+
+def _parse_hunks(patch: str) -> List[dict]:
+    hunks: List[dict] = []
+    current: Optional[dict] = None
+
+    for line in patch.strip("\n").splitlines():
+        header = HUNK_HEADER.match(line)
+        if header:
+            current = {
+                "start": int(header.group(1)) if header.group(1) else None,
+                "old": [],
+                "new": [],
+            }
+            hunks.append(current)
+            continue
+
+        if current is None or CODE_FENCE.match(line) or line.startswith("\\"):
+            # File headers, markdown fences, "\ No newline at end of file".
+            continue
+
+        tag, text = (line[0], line[1:]) if line else (" ", "")
+        if tag == " ":
+            current["old"].append(text)
+            current["new"].append(text)
+        elif tag == "-":
+            current["old"].append(text)
+        elif tag == "+":
+            current["new"].append(text)
+        else:
+            raise PatchError(f"Unexpected line in hunk: {line[:80]!r}")
+
+    if not hunks:
+        raise PatchError("Patch contains no hunks")
+    return hunks
+
+
+def _find_hunk(lines: List[str], old: List[str], expected: int, not_before: int) -> int:
+    """Position of `old` in `lines` nearest to `expected`, or -1."""
+    if not old:
+        return min(max(expected, not_before), len(lines))
+
+    wanted = [line.rstrip() for line in old]
+    matches = [
+        position
+        for position in range(not_before, len(lines) - len(old) + 1)
+        if [line.rstrip() for line in lines[position : position + len(old)]] == wanted
+    ]
+    if not matches:
+        return -1
+    return min(matches, key=lambda position: abs(position - expected))
+
+
+def apply_patch(code: str, patch: str) -> str:
+    """
+    Apply a unified diff to `code`. Hunk line numbers are only used as a
+    hint, since models often get them slightly wrong; the context and
+    removed lines decide where a hunk goes. Trailing whitespace is
+    ignored when matching.
+    """
+    lines = code.splitlines()
+    offset = 0
+    not_before = 0
+
+    for number, hunk in enumerate(_parse_hunks(patch), 1):
+        if hunk["start"] is None:
+            expected = not_before
+        else:
+            expected = max(hunk["start"] - 1, 0) + offset
+
+        position = _find_hunk(lines, hunk["old"], expected, not_before)
+        if position < 0:
+            raise PatchError(f"Hunk {number} does not match the code")
+
+        lines[position : position + len(hunk["old"])] = hunk["new"]
+        offset += len(hunk["new"]) - len(hunk["old"])
+        not_before = position + len(hunk["new"])
+
+    patched = "\n".join(lines)
+    return patched + "\n" if code.endswith("\n") and patched else patched
+
+
+def fix_from_response(code: str, parsed: dict, fix_format: str) -> dict:
+    """
+    Turn a parsed model response into {"explanation", "fixed_code",
+    "patch"}. Raises PatchError if a patch-mode response has no usable
+    patch.
+    """
+    if not isinstance(parsed, dict):
+        raise ValueError("Response is not a JSON object")
+
+    if fix_format != "patch":
+        return {**parsed, "patch": None}
+
+    patch = parsed.get("patch")
+    if not isinstance(patch, str) or not patch.strip():
+        raise PatchError("Response has no patch")
+
+    return {
+        "explanation": parsed.get("explanation", ""),
+        "fixed_code": apply_patch(code, patch),
+        "patch": patch,
+    }
@@ -1,75 +1,99 @@
-import os
-import json
-from dotenv import load_dotenv
-from pydantic import BaseModel
-from openai import OpenAI
-
-load_dotenv()
-
-api_key = os.getenv("OPENROUTER_API_KEY")
-if not api_key:
-    raise ValueError("OPENROUTER_API_KEY not set")
-
-client = OpenAI(
-    api_key=api_key,
-    base_url="https://openrouter.ai/api/v1",
-)
-
-
-class BugFixResponse(BaseModel):
-    explanation: str
-    fixed_code: str
-
-
-def generate_fix_fallback(language: str, code: str, error: str) -> BugFixResponse:
+from typing import Iterator, Optional
+from services.config import LLM_CALL_TIMEOUT, LLM_FIX_FORMAT
+from services.llm_providers import provider_registry
+from services.llm_service import BugFixResponse
+from services.fix_patch import build_fix_prompt, fix_from_response
+from services.llm_json import JSONStringFieldReader, parse_response, structured_output
+
+
+FALLBACK_MODEL = "arcee-ai/trinity-large-preview:free"
+
+
+def _fix_request(
+    language: str,
+    code: str,
+    error: str,
+    fix_format: str,
+    temperature: Optional[float] = None,
+) -> dict:
+    """Keyword arguments for chat.completions.create()."""
+    request = {
+        "model": FALLBACK_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": build_fix_prompt(language, code, error, fix_format),
+            }
+        ],
+        "temperature": 0 if temperature is None else temperature,
+        "timeout": LLM_CALL_TIMEOUT,
+    }
+    if structured_output("openrouter"):
+        request["response_format"] = {"type": "json_object"}
+    return request
+
+
+def _request_fix(
+    language: str,
+    code: str,
+    error: str,
+    fix_format: str,
+    temperature: Optional[float] = None,
+) -> BugFixResponse:
+    """Ask OpenRouter for a fix in the given format; ValueError on a bad answer."""
+    client = provider_registry.get("openrouter")
+    response = client.chat.completions.create(
+        **_fix_request(language, code, error, fix_format, temperature)
+    )
+
+    if not response.choices:
+        raise ValueError("Fallback LLM returned no response")
+
+    parsed = parse_response("openrouter", response.choices[0].message.content)
+    return BugFixResponse(**fix_from_response(code, parsed, fix_format))
+
+
+def request_fix(
+    language: str, code: str, error: str, temperature: Optional[float] = None
+) -> BugFixResponse:
     """
-    Fallback LLM using Arcee Trinity Large Preview (free).
+    Fallback LLM using Arcee Trinity Large Preview (free). Errors are
+    raised, as in llm_service.request_fix().
     """
-    try:
-        prompt = f"""
-You are an expert {language} debugger.
-
-User code:
-{code}
-
-Error:
-{error}
-
-Respond ONLY with valid JSON in this format:
-{{
-  "explanation": "Brief explanation of the issue and fix",
-  "fixed_code": "Complete corrected code"
-}}
-
-Do not include markdown or extra text.
-"""
-
-        response = client.chat.completions.create(
-            model="arcee-ai/trinity-large-preview:free",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-        )
+    if LLM_FIX_FORMAT == "patch":
+        try:
+            return _request_fix(language, code, error, "patch", temperature)
+        except ValueError:
+            # Unparseable or non-applying patch: ask for the full code.
+            pass
 
-        if not response.choices:
-            return BugFixResponse(
-                explanation="Fallback LLM returned no response",
-                fixed_code="",
-            )
+    return _request_fix(language, code, error, "full", temperature)
 
-        text = response.choices[0].message.content.strip()
 
-        try:
-            parsed = json.loads(text)
-            return BugFixResponse(**parsed)
-
-        except Exception as parse_error:
-            return BugFixResponse(
-                explanation=f"Fallback parse failed: {parse_error}",
-                fixed_code="",
-            )
-
-    except Exception as e:
-        return BugFixResponse(
-            explanation=f"Fallback LLM error: {str(e)}",
-            fixed_code="",
-        )
+def _streamed_fix(language: str, code: str, error: str, text: str) -> BugFixResponse:
+    """Turn the full text of a streamed answer into a fix."""
+    try:
+        parsed = parse_response("openrouter", text)
+        return BugFixResponse(**fix_from_response(code, parsed, LLM_FIX_FORMAT))
+    except ValueError:
+        if LLM_FIX_FORMAT != "patch":
+            raise
+
+    # Unparseable or non-applying patch: ask for the full code.
+    return _request_fix(language, code, error, "full")
+
+
+def stream_fix(language: str, code: str, error: str) -> Iterator[dict]:
+    """Streaming request_fix(); same events as llm_service.stream_fix()."""
+    reader = JSONStringFieldReader("explanation")
+    client = provider_registry.get("openrouter")
+    for chunk in client.chat.completions.create(
+        **_fix_request(language, code, error, LLM_FIX_FORMAT), stream=True
+    ):
+        if not chunk.choices:
+            continue
+        delta = reader.feed(chunk.choices[0].delta.content or "")
+        if delta:
+            yield {"event": "explanation", "delta": delta}
+
+    yield {"event": "fix", "fix": _streamed_fix(language, code, error, reader.text)}
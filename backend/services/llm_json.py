@@ -0,0 +1,265 @@
+"""
+Tolerant JSON extraction from LLM responses.
+
+Models asked for "only JSON" still wrap it in markdown fences, put a
+sentence in front of it or leave raw newlines inside strings, and a
+plain json.loads() turns each of those into a wasted round trip. Where a
+provider supports it, the request asks for native JSON / schema output
+instead; whatever comes back is then parsed here:
+
+- the whole text is tried first;
+- otherwise JSONObjectScanner finds the first balanced {...} outside of
+  strings that parses, skipping fences and prose around it;
+- control characters inside strings are accepted.
+
+Parse outcomes are counted per provider (clean, recovered, failed).
+"""
+
+import json
+import re
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from services.config import LLM_STRUCTURED_OUTPUT
+
+# Providers whose native JSON mode is known to work with the models used.
+NATIVE_JSON_PROVIDERS = {"gemini"}
+
+JSON_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+UNICODE_ESCAPE = re.compile(r"\\u([0-9a-fA-F]{4})(?:\\u([dD][c-fC-F][0-9a-fA-F]{2}))?")
+
+
+class JSONExtractionError(ValueError):
+    """The response holds no parseable JSON object."""
+
+
+def structured_output(provider: str) -> bool:
+    """Whether requests to `provider` should ask for native JSON output."""
+    if LLM_STRUCTURED_OUTPUT == "all":
+        return True
+    if LLM_STRUCTURED_OUTPUT == "auto":
+        return provider in NATIVE_JSON_PROVIDERS
+    return False
+
+
+class JSONObjectScanner:
+    """
+    Finds the first balanced JSON object in text fed to it piece by
+    piece, so callers can stop reading a stream as soon as it is complete.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.value: Optional[Any] = None
+        self.found = False
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> bool:
+        """Add text; returns True once an object has been found."""
+        if self.found:
+            return True
+        self.text += chunk
+        return self._scan()
+
+    def finish(self) -> bool:
+        """
+        No more text is coming: retry from each later "{" after an opening
+        brace that never closed (e.g. a stray brace in leading prose).
+        """
+        while not self.found and self._start is not None:
+            self._restart(self._start + 1)
+            self._scan()
+        return self.found
+
+    def _restart(self, pos: int) -> None:
+        self._pos = pos
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def _scan(self) -> bool:
+        text = self.text
+        while self._pos < len(text):
+            char = text[self._pos]
+
+            if self._start is None:
+                if char == "{":
+                    self._start = self._pos
+                    self._depth = 1
+                self._pos += 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self.value = json.loads(
+                            text[self._start : self._pos + 1], strict=False
+                        )
+                    except ValueError:
+                        # Not JSON after all; look for the next object.
+                        self._restart(self._start + 1)
+                        continue
+                    self.found = True
+                    return True
+
+            self._pos += 1
+
+        return False
+
+
+class JSONStringFieldReader:
+    """
+    Decodes the value of one string field of a JSON object while the
+    object is still streaming in, e.g. to forward an explanation to the
+    client as the model writes it.
+    """
+
+    def __init__(self, field: str):
+        self.pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self.text = ""
+        self.done = False
+        self._pos: Optional[int] = None
+
+    def feed(self, chunk: str) -> str:
+        """Add text; returns the newly decoded part of the field's value."""
+        self.text += chunk
+        if self.done:
+            return ""
+
+        if self._pos is None:
+            match = self.pattern.search(self.text)
+            if match is None:
+                return ""
+            self._pos = match.end()
+
+        text = self.text
+        decoded = []
+        pos = self._pos
+        while pos < len(text):
+            char = text[pos]
+            if char == '"':
+                self.done = True
+                pos += 1
+                break
+            if char != "\\":
+                decoded.append(char)
+                pos += 1
+                continue
+
+            # Escapes split across chunks wait for the rest.
+            if pos + 1 >= len(text):
+                break
+            escape = text[pos + 1]
+            if escape == "u":
+                # A high surrogate needs its low half before it can be decoded.
+                if pos + 12 > len(text) and not self._complete_unicode(text, pos):
+                    break
+                match = UNICODE_ESCAPE.match(text, pos)
+                if match is None:
+                    decoded.append(text[pos : pos + 2])
+                    pos += 2
+                    continue
+                decoded.append(json.loads(f'"{match.group(0)}"'))
+                pos = match.end()
+                continue
+            decoded.append(JSON_ESCAPES.get(escape, escape))
+            pos += 2
+
+        self._pos = pos
+        return "".join(decoded)
+
+    @staticmethod
+    def _complete_unicode(text: str, pos: int) -> bool:
+        """Whether the \\u escape at `pos` can be decoded without more text."""
+        if pos + 6 > len(text):
+            return False
+        try:
+            code = int(text[pos + 2 : pos + 6], 16)
+        except ValueError:
+            return True
+        return not 0xD800 <= code <= 0xDBFF
+
+
+def extract_json(text: Optional[str]) -> Tuple[Any, bool]:
+    """
+    Returns (value, recovered), where recovered is False if the whole
+    text was valid JSON. Raises JSONExtractionError if nothing parses.
+    """
+    if not text or not text.strip():
+        raise JSONExtractionError("Empty response")
+
+    try:
+        return json.loads(text, strict=False), False
+    except ValueError:
+        pass
+
+    scanner = JSONObjectScanner()
+    if scanner.feed(text) or scanner.finish():
+        return scanner.value, True
+
+    raise JSONExtractionError("No JSON object found in response")
+
+
+class ParseTracker:
+    """Counts clean, recovered and failed response parses per provider."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, provider: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(
+                provider, {"clean": 0, "recovered": 0, "failed": 0}
+            )
+            counts[outcome] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {provider: dict(c) for provider, c in self._counts.items()}
+
+        return {
+            provider: {**c, "failure_rate": c["failed"] / sum(c.values())}
+            for provider, c in counts.items()
+        }
+
+
+parse_tracker = ParseTracker()
+
+
+def parse_response(provider: str, text: Optional[str]) -> Any:
+    """extract_json() that records the outcome for `provider`."""
+    try:
+        value, recovered = extract_json(text)
+    except JSONExtractionError:
+        parse_tracker.record(provider, "failed")
+        raise
+
+    parse_tracker.record(provider, "recovered" if recovered else "clean")
+    return value
@@ -0,0 +1,59 @@
+"""
+Per-provider LLM latency tracking.
+
+Keeps a rolling window of recent call latencies for each provider so
+callers can derive percentiles, e.g. to decide when to hedge a slow call.
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from services.config import LLM_LATENCY_WINDOW
+
+
+class LatencyTracker:
+    """Rolling window of call latencies (seconds) per provider."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, provider: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(provider)
+            if samples is None:
+                samples = self._samples[provider] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def count(self, provider: str) -> int:
+        with self._lock:
+            return len(self._samples.get(provider, ()))
+
+    def percentile(self, provider: str, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(provider, ()))
+
+        if not samples:
+            return None
+
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def stats(self) -> dict:
+        with self._lock:
+            providers = list(self._samples)
+
+        return {
+            provider: {
+                "samples": self.count(provider),
+                "p50": self.percentile(provider, 50),
+                "p90": self.percentile(provider, 90),
+                "p99": self.percentile(provider, 99),
+            }
+            for provider in providers
+        }
+
+
+latency_tracker = LatencyTracker(LLM_LATENCY_WINDOW)
@@ -0,0 +1,123 @@
+"""
+Registry of LLM provider clients.
+
+Clients are created on first use, so the app starts without every API key
+and without importing every SDK. Each client gets its own pooled
+keep-alive HTTP connection pool and default timeouts, and is reused for
+every call after that.
+"""
+
+import atexit
+import os
+import threading
+from typing import Any, Callable, Dict
+
+from services.config import (
+    LLM_CALL_TIMEOUT,
+    LLM_CONNECT_TIMEOUT,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_MAX_RETRIES,
+)
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+
+class ProviderNotConfigured(RuntimeError):
+    """
+    Raised when a provider is used without its API key. Not a ValueError,
+    which callers treat as an unusable answer worth asking again for.
+    """
+
+
+def _http_client():
+    import httpx
+
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(LLM_CALL_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    )
+
+
+def _create_gemini_client(api_key: str) -> Any:
+    from google import genai
+    from google.genai import types
+
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(
+            timeout=int(LLM_CALL_TIMEOUT * 1000),
+            httpx_client=_http_client(),
+        ),
+    )
+
+
+def _create_openrouter_client(api_key: str) -> Any:
+    from openai import OpenAI
+
+    return OpenAI(
+        api_key=api_key,
+        base_url=OPENROUTER_BASE_URL,
+        http_client=_http_client(),
+        max_retries=LLM_MAX_RETRIES,
+    )
+
+
+class ProviderRegistry:
+    """Creates provider clients lazily and keeps one per provider."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._factories: Dict[str, tuple] = {}
+        self._clients: Dict[str, Any] = {}
+
+    def register(
+        self, name: str, api_key_env: str, factory: Callable[[str], Any]
+    ) -> None:
+        self._factories[name] = (api_key_env, factory)
+
+    def is_configured(self, name: str) -> bool:
+        api_key_env, _ = self._factories[name]
+        return bool(os.getenv(api_key_env))
+
+    def get(self, name: str) -> Any:
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(name)
+            if client is not None:
+                return client
+
+            api_key_env, factory = self._factories[name]
+            api_key = os.getenv(api_key_env)
+            if not api_key:
+                raise ProviderNotConfigured(f"{api_key_env} not set")
+
+            client = self._clients[name] = factory(api_key)
+            return client
+
+    def close(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+
+        for client in clients:
+            close = getattr(client, "close", None)
+            try:
+                if close is not None:
+                    close()
+            except Exception:
+                pass
+
+
+provider_registry = ProviderRegistry()
+provider_registry.register("gemini", "GEMINI_API_KEY", _create_gemini_client)
+provider_registry.register("openrouter", "OPENROUTER_API_KEY", _create_openrouter_client)
+atexit.register(provider_registry.close)
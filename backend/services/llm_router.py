@@ -0,0 +1,398 @@
+"""
+Routing of every LLM call across the configured providers.
+
+Fixes, streamed fixes and code explanations all go through the router,
+which tries the providers listed in LLM_PROVIDERS in turn until one
+gives a usable answer, and owns the fix and explanation caches. Each
+provider has:
+
+- a circuit breaker: after LLM_BREAKER_FAILURES consecutive failures it
+  opens and the provider is skipped without a call, so a provider that
+  is down does not cost every request a timeout. After
+  LLM_BREAKER_RESET seconds one trial call is let through (half open);
+  it closes the breaker again or reopens it;
+- exponentially weighted moving averages of its latency and error rate.
+
+Providers are tried fastest first by EWMA latency, with those whose
+error rate is above UNHEALTHY_ERROR_RATE last. A provider without
+latency samples yet keeps its LLM_PROVIDERS position behind those that
+have them, so the preferred provider is used until there is data.
+Providers whose API key is not set are left out.
+"""
+
+import threading
+import time
+from typing import Callable, Iterator, List, Optional
+
+from services import llm_fallback, llm_service, llm_stub
+from services.config import (
+    LLM_PROVIDERS,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET,
+    LLM_EWMA_ALPHA,
+)
+from services.explain_cache import explain_cache
+from services.fix_cache import fix_cache
+from services.llm_metrics import latency_tracker
+from services.llm_providers import provider_registry
+from services.llm_service import BugFixResponse, CodeExplanationResponse
+
+UNHEALTHY_ERROR_RATE = 0.5
+# Start of a fix's explanation when no provider gave one.
+ALL_FAILED_PREFIX = "All AI services failed: "
+
+
+class CircuitBreaker:
+    """Closed, open or half-open state of one provider."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether allow() would let a call through now."""
+        with self._lock:
+            return self._allowed(time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Whether to call the provider. Once the reset timeout has passed,
+        an open breaker lets one trial call through and turns half open
+        until record_success(), record_failure() or release_trial() is
+        called. A trial that never reports back is replaced by another
+        one after the same timeout.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not self._allowed(now):
+                return False
+            if self.state != "closed":
+                self.state = "half_open"
+                self.opened_at = now
+            return True
+
+    def _allowed(self, now: float) -> bool:
+        return self.state == "closed" or now - self.opened_at >= self.reset_timeout
+
+    def release_trial(self) -> None:
+        """A call was abandoned without an outcome; let the next trial through."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class Provider:
+    """A provider's call functions, breaker and health averages."""
+
+    def __init__(
+        self,
+        name: str,
+        request_fix: Callable[..., BugFixResponse],
+        stream_fix: Callable[..., Iterator[dict]],
+        request_explanation: Optional[Callable[..., CodeExplanationResponse]],
+        configured: Callable[[], bool],
+        cacheable: bool = True,
+    ):
+        self.name = name
+        self.request_fix = request_fix
+        self.stream_fix = stream_fix
+        self.request_explanation = request_explanation
+        self.configured = configured
+        # Whether answers may go into the fix and explanation caches.
+        self.cacheable = cacheable
+
+        self.breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "failures": 0, "short_circuited": 0}
+
+    def record(self, seconds: float, failed: bool) -> None:
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+            latency_tracker.record(self.name, seconds)
+
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["failures"] += int(failed)
+            self.error_rate += LLM_EWMA_ALPHA * (float(failed) - self.error_rate)
+            if not failed:
+                if self.latency is None:
+                    self.latency = seconds
+                else:
+                    self.latency += LLM_EWMA_ALPHA * (seconds - self.latency)
+
+    def count_short_circuit(self) -> None:
+        with self._lock:
+            self._counters["short_circuited"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["ewma_latency"] = self.latency
+            stats["ewma_error_rate"] = self.error_rate
+        stats["breaker"] = self.breaker.state
+        stats["configured"] = self.configured()
+        return stats
+
+
+class LLMRouter:
+    """Sends each LLM call to the best available provider, falling back in turn."""
+
+    def __init__(self, providers: List[Provider]):
+        self.providers = providers
+
+    def ranked(self) -> List[str]:
+        """Names of the providers a call would try, in order."""
+        return [provider.name for provider in self._ranked()]
+
+    def _ranked(
+        self, names: Optional[List[str]] = None, include_open: bool = False
+    ) -> List[Provider]:
+        preference = {
+            provider.name: index for index, provider in enumerate(self.providers)
+        }
+        candidates = [
+            provider
+            for provider in self.providers
+            if (names is None or provider.name in names)
+            and provider.configured()
+            and (include_open or provider.breaker.available())
+        ]
+        return sorted(
+            candidates,
+            key=lambda provider: (
+                provider.error_rate > UNHEALTHY_ERROR_RATE,
+                provider.latency is None,
+                provider.latency or 0.0,
+                preference[provider.name],
+            ),
+        )
+
+    def _route(self, names: Optional[List[str]] = None) -> Iterator[Provider]:
+        """Providers to try in order, skipping any whose breaker is open."""
+        for provider in self._ranked(names, include_open=True):
+            if provider.breaker.allow():
+                yield provider
+            else:
+                provider.count_short_circuit()
+
+    def _call(self, provider: Provider, function: Callable, *args):
+        """Call one of the provider's functions and record the outcome."""
+        started_at = time.monotonic()
+        try:
+            result = function(*args)
+        except Exception:
+            provider.record(time.monotonic() - started_at, failed=True)
+            raise
+        provider.record(time.monotonic() - started_at, failed=False)
+        return result
+
+    def generate_fix(
+        self,
+        language: str,
+        code: str,
+        error: str,
+        temperature: Optional[float] = None,
+        providers: Optional[List[str]] = None,
+        accept: Optional[Callable[[BugFixResponse], bool]] = None,
+    ) -> BugFixResponse:
+        """
+        A fix from the first provider that answers. `providers` limits the
+        call (and cached fixes) to those names; a fix that `accept`
+        rejects (e.g. unsafe code) moves on to the next provider without
+        counting as a failure. Never raises: when no provider gives a usable fix, the
+        response has an empty fixed_code and says why.
+        """
+        # An explicit temperature asks for a fresh sample (beam candidates),
+        # so the fix cache is bypassed.
+        use_cache = temperature is None
+
+        cached = fix_cache.lookup(language, code, error) if use_cache else None
+        if cached is not None and (
+            providers is None or cached.get("provider") in providers
+        ):
+            fix = BugFixResponse(**cached)
+            if accept is None or accept(fix):
+                return fix
+
+        last_error = "no LLM provider configured or available"
+        rejected: Optional[BugFixResponse] = None
+
+        for provider in self._route(providers):
+            try:
+                fix = self._call(
+                    provider, provider.request_fix, language, code, error, temperature
+                )
+            except Exception as e:
+                last_error = f"{provider.name}: {e}"
+                continue
+
+            fix.provider = provider.name
+            if accept is not None and not accept(fix):
+                rejected = fix
+                continue
+
+            if use_cache and provider.cacheable:
+                fix_cache.store_fix(language, code, error, fix.model_dump())
+            return fix
+
+        if rejected is not None:
+            return BugFixResponse(
+                explanation=rejected.explanation,
+                fixed_code="",
+                provider=rejected.provider,
+            )
+        return BugFixResponse(explanation=ALL_FAILED_PREFIX + last_error, fixed_code="")
+
+    def stream_fix(self, language: str, code: str, error: str) -> Iterator[dict]:
+        """
+        Streaming generate_fix(): {"event": "explanation", "delta"} events,
+        a {"event": "fallback", "provider", "detail"} event each time a
+        provider fails and the next one takes over (the client should
+        drop the explanation so far), then one {"event": "fix", "fix"}.
+        """
+        cached = fix_cache.lookup(language, code, error)
+        if cached is not None:
+            fix = BugFixResponse(**cached)
+            yield {"event": "explanation", "delta": fix.explanation}
+            yield {"event": "fix", "fix": fix}
+            return
+
+        last_error = "no LLM provider configured or available"
+        failed = False
+
+        for provider in self._route():
+            if failed:
+                yield {
+                    "event": "fallback",
+                    "provider": provider.name,
+                    "detail": last_error,
+                }
+
+            started_at = time.monotonic()
+            fix = None
+            try:
+                for event in provider.stream_fix(language, code, error):
+                    if event["event"] == "fix":
+                        fix = event["fix"]
+                    else:
+                        yield event
+                if fix is None:
+                    raise ValueError("Stream ended without a fix")
+            except GeneratorExit:
+                # The client went away mid-answer: no verdict on the provider.
+                provider.breaker.release_trial()
+                raise
+            except Exception as e:
+                provider.record(time.monotonic() - started_at, failed=True)
+                last_error = f"{provider.name}: {e}"
+                failed = True
+                continue
+            provider.record(time.monotonic() - started_at, failed=False)
+
+            fix.provider = provider.name
+            if provider.cacheable:
+                fix_cache.store_fix(language, code, error, fix.model_dump())
+            yield {"event": "fix", "fix": fix}
+            return
+
+        yield {
+            "event": "fix",
+            "fix": BugFixResponse(
+                explanation=ALL_FAILED_PREFIX + last_error, fixed_code=""
+            ),
+        }
+
+    def explain_code(self, language: str, code: str) -> CodeExplanationResponse:
+        """An analysis of the code from the first provider that answers."""
+        cached = explain_cache.lookup(language, code)
+        if cached is not None:
+            return CodeExplanationResponse(**cached)
+
+        last_error = "no LLM provider configured or available"
+        for provider in self._route():
+            if provider.request_explanation is None:
+                continue
+            try:
+                explanation = self._call(
+                    provider, provider.request_explanation, language, code
+                )
+            except Exception as e:
+                last_error = f"{provider.name}: {e}"
+                continue
+
+            if provider.cacheable:
+                explain_cache.store_explanation(
+                    language, code, explanation.model_dump()
+                )
+            return explanation
+
+        return CodeExplanationResponse(
+            explanation=f"LLM service error: {last_error}",
+            time_complexity="Unable to determine",
+            space_complexity="Unable to determine",
+            optimizations=["AI service unavailable"],
+        )
+
+    def stats(self) -> dict:
+        return {
+            "order": self.ranked(),
+            "providers": {
+                provider.name: provider.stats() for provider in self.providers
+            },
+        }
+
+
+def _api_key_set(name: str) -> Callable[[], bool]:
+    return lambda: provider_registry.is_configured(name)
+
+
+PROVIDERS = {
+    "gemini": lambda: Provider(
+        "gemini",
+        llm_service.request_fix,
+        llm_service.stream_fix,
+        llm_service.request_explanation,
+        _api_key_set("gemini"),
+    ),
+    "openrouter": lambda: Provider(
+        "openrouter",
+        llm_fallback.request_fix,
+        llm_fallback.stream_fix,
+        None,
+        _api_key_set("openrouter"),
+    ),
+    "stub": lambda: Provider(
+        "stub",
+        llm_stub.request_fix,
+        llm_stub.stream_fix,
+        llm_stub.request_explanation,
+        lambda: True,
+        cacheable=False,
+    ),
+}
+
+
+llm_router = LLMRouter(
+    [PROVIDERS[name]() for name in dict.fromkeys(LLM_PROVIDERS) if name in PROVIDERS]
+)
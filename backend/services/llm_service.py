@@ -1,21 +1,19 @@
-import os
-import json
-from dotenv import load_dotenv
+from typing import Iterator, Optional
 from pydantic import BaseModel
-from google import genai
+from services.config import GEMINI_MODEL, LLM_CALL_TIMEOUT, LLM_FIX_FORMAT
+from services.llm_providers import provider_registry
+from services.fix_patch import RESPONSE_SCHEMAS, build_fix_prompt, fix_from_response
+from services.llm_json import JSONStringFieldReader, parse_response, structured_output
 
-load_dotenv()
-
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    raise ValueError("GEMINI_API_KEY not set")
-
-client = genai.Client(api_key=api_key)
+CALL_CONFIG = {"http_options": {"timeout": int(LLM_CALL_TIMEOUT * 1000)}}
 
 
 class BugFixResponse(BaseModel):
     explanation: str
     fixed_code: str
+    patch: Optional[str] = None
+    # Set by llm_router to the provider that answered.
+    provider: Optional[str] = None
 
 
 class CodeExplanationResponse(BaseModel):
@@ -25,50 +23,88 @@ class CodeExplanationResponse(BaseModel):
     optimizations: list[str]
 
 
-def generate_fix(language: str, code: str, error: str) -> BugFixResponse:
-    try:
-        prompt = f"""
-You are an expert {language} debugger.
-
-User code:
-{code}
-
-Error:
-{error}
-
-Respond ONLY with valid JSON in this format:
-{{
-  "explanation": "Brief explanation of the issue and fix",
-  "fixed_code": "Complete corrected code"
-}}
-
-Do not include markdown or extra text.
-"""
-
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview",
-            contents=prompt,
-        )
-
-        text = response.text.strip()
-
+def _fix_config(fix_format: str, temperature: Optional[float] = None) -> dict:
+    config = dict(CALL_CONFIG)
+    if temperature is not None:
+        config["temperature"] = temperature
+    if structured_output("gemini"):
+        config["response_mime_type"] = "application/json"
+        config["response_schema"] = RESPONSE_SCHEMAS[fix_format]
+    return config
+
+
+def _request_fix(
+    language: str,
+    code: str,
+    error: str,
+    fix_format: str,
+    temperature: Optional[float] = None,
+) -> BugFixResponse:
+    """Ask Gemini for a fix in the given format; raises ValueError on a bad answer."""
+    client = provider_registry.get("gemini")
+    response = client.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=build_fix_prompt(language, code, error, fix_format),
+        config=_fix_config(fix_format, temperature),
+    )
+
+    parsed = parse_response("gemini", response.text)
+    return BugFixResponse(**fix_from_response(code, parsed, fix_format))
+
+
+def request_fix(
+    language: str, code: str, error: str, temperature: Optional[float] = None
+) -> BugFixResponse:
+    """
+    Ask Gemini for a fix. Provider errors and unusable answers are raised;
+    llm_router handles caching and falling back to other providers.
+    """
+    if LLM_FIX_FORMAT == "patch":
         try:
-            parsed = json.loads(text)
-            return BugFixResponse(**parsed)
+            return _request_fix(language, code, error, "patch", temperature)
+        except ValueError:
+            # Unparseable or non-applying patch: ask for the full code.
+            pass
 
-        except Exception as parse_error:
-            return BugFixResponse(
-                explanation=f"Failed to parse LLM response: {parse_error}",
-                fixed_code="",
-            )
+    return _request_fix(language, code, error, "full", temperature)
 
-    except Exception as e:
-        return BugFixResponse(explanation=f"LLM error: {str(e)}", fixed_code="")
 
-
-def explain_code(language: str, code: str) -> CodeExplanationResponse:
+def _streamed_fix(language: str, code: str, error: str, text: str) -> BugFixResponse:
+    """Turn the full text of a streamed answer into a fix, as request_fix() would."""
     try:
-        prompt = f"""
+        parsed = parse_response("gemini", text)
+        return BugFixResponse(**fix_from_response(code, parsed, LLM_FIX_FORMAT))
+    except ValueError:
+        if LLM_FIX_FORMAT != "patch":
+            raise
+
+    # Unparseable or non-applying patch: ask for the full code.
+    return _request_fix(language, code, error, "full")
+
+
+def stream_fix(language: str, code: str, error: str) -> Iterator[dict]:
+    """
+    Streaming request_fix(): yields {"event": "explanation", "delta"}
+    events while the model writes its explanation, then one
+    {"event": "fix", "fix": BugFixResponse}. Errors are raised.
+    """
+    reader = JSONStringFieldReader("explanation")
+    client = provider_registry.get("gemini")
+    for chunk in client.models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=build_fix_prompt(language, code, error, LLM_FIX_FORMAT),
+        config=_fix_config(LLM_FIX_FORMAT),
+    ):
+        delta = reader.feed(chunk.text or "")
+        if delta:
+            yield {"event": "explanation", "delta": delta}
+
+    yield {"event": "fix", "fix": _streamed_fix(language, code, error, reader.text)}
+
+
+def request_explanation(language: str, code: str) -> CodeExplanationResponse:
+    """Ask Gemini to analyse the code; errors are raised."""
+    prompt = f"""
 You are an expert {language} code analyst and optimization specialist.
 
 Analyze this code:
@@ -91,29 +127,19 @@ Guidelines:
 Respond ONLY with valid JSON. No markdown or extra text.
 """
 
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview",
-            contents=prompt,
-        )
-
-        text = response.text.strip()
-
-        try:
-            parsed = json.loads(text)
-            return CodeExplanationResponse(**parsed)
-
-        except Exception as parse_error:
-            return CodeExplanationResponse(
-                explanation=f"Failed to parse LLM response: {parse_error}",
-                time_complexity="Unable to determine",
-                space_complexity="Unable to determine",
-                optimizations=["AI analysis failed"],
-            )
-
-    except Exception as e:
-        return CodeExplanationResponse(
-            explanation=f"LLM service error: {str(e)}",
-            time_complexity="Unable to determine",
-            space_complexity="Unable to determine",
-            optimizations=["AI service unavailable"],
-        )
+    config = dict(CALL_CONFIG)
+    if structured_output("gemini"):
+        config["response_mime_type"] = "application/json"
+        config["response_schema"] = CodeExplanationResponse
+
+    client = provider_registry.get("gemini")
+    response = client.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config=config,
+    )
+
+    parsed = parse_response("gemini", response.text)
+    if not isinstance(parsed, dict):
+        raise ValueError("Response is not a JSON object")
+    return CodeExplanationResponse(**parsed)
@@ -0,0 +1,58 @@
+"""
+Offline stand-in for an LLM provider.
+
+Enabled by listing "stub" in LLM_PROVIDERS (e.g. LLM_PROVIDERS=stub for
+tests and local development without API keys or network). It answers
+deterministically, and instantly unless LLM_STUB_DELAY slows its stream
+down: the explanation quotes the compacted error and the "fixed" code is
+the submitted code unchanged.
+"""
+
+import time
+from typing import Iterator, Optional
+
+from services.config import LLM_STUB_DELAY
+from services.error_compactor import compact_error
+from services.llm_service import BugFixResponse, CodeExplanationResponse
+
+STREAM_CHUNK_WORDS = 4
+
+
+def _explanation(language: str, code: str, error: str) -> str:
+    compacted = (compact_error(language, error, code) or "").strip()
+    summary = compacted.splitlines()[0] if compacted else "no error output"
+    return f"Stub provider (no model was called). The code fails with: {summary}"
+
+
+def request_fix(
+    language: str, code: str, error: str, temperature: Optional[float] = None
+) -> BugFixResponse:
+    return BugFixResponse(
+        explanation=_explanation(language, code, error), fixed_code=code
+    )
+
+
+def stream_fix(language: str, code: str, error: str) -> Iterator[dict]:
+    """
+    Same events as llm_service.stream_fix(), a few words at a time,
+    LLM_STUB_DELAY seconds apart.
+    """
+    fix = request_fix(language, code, error)
+    words = fix.explanation.split(" ")
+    for start in range(0, len(words), STREAM_CHUNK_WORDS):
+        time.sleep(LLM_STUB_DELAY)
+        delta = " ".join(words[start : start + STREAM_CHUNK_WORDS])
+        if start + STREAM_CHUNK_WORDS < len(words):
+            delta += " "
+        yield {"event": "explanation", "delta": delta}
+    yield {"event": "fix", "fix": fix}
+
+
+def request_explanation(language: str, code: str) -> CodeExplanationResponse:
+    lines = len(code.splitlines())
+    return CodeExplanationResponse(
+        explanation=f"Stub provider (no model was called): {lines} lines of {language}",
+        time_complexity="Unknown (stub provider)",
+        space_complexity="Unknown (stub provider)",
+        optimizations=["Configure a real LLM provider for an analysis"],
+    )
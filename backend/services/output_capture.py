@@ -0,0 +1,219 @@
+"""
+Bounded capture of a child process's stdout and stderr.
+
+Output is read incrementally as the child produces it. Each stream keeps
+at most `limit` bytes: the first half as a head and the most recent half
+as a tail, with a marker in between, so a snippet printing in an endless
+loop cannot grow server memory (or an LLM prompt) without bound. Output
+captured before a timeout is attached to the TimeoutExpired exception.
+"""
+
+import os
+import selectors
+import subprocess
+import threading
+import time
+from typing import Optional, Tuple
+
+READ_CHUNK = 65536
+WRITE_CHUNK = 65536
+DRAIN_AFTER_KILL = 0.1
+
+
+class BoundedBuffer:
+    """Keeps the first and last limit/2 bytes written to it."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.head_limit = limit - limit // 2
+        self.tail_limit = limit // 2
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data: bytes) -> None:
+        self.total += len(data)
+
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+
+        if data and self.tail_limit > 0:
+            self.tail += data
+            if len(self.tail) > self.tail_limit:
+                del self.tail[: len(self.tail) - self.tail_limit]
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.head) + len(self.tail)
+
+    def text(self) -> str:
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if not self.truncated:
+            return head + tail
+
+        skipped = self.total - len(self.head) - len(self.tail)
+        return f"{head}\n... [{skipped} bytes truncated] ...\n{tail}"
+
+
+def truncate_text(text: str, limit: int) -> Tuple[str, bool]:
+    """Apply the same head/tail policy to text that is already in memory."""
+    buffer = BoundedBuffer(limit)
+    buffer.write(text.encode("utf-8"))
+    return buffer.text(), buffer.truncated
+
+
+class CapturedOutput:
+    def __init__(self, stdout: BoundedBuffer, stderr: BoundedBuffer):
+        self.stdout = stdout.text()
+        self.stderr = stderr.text()
+        self.truncated = stdout.truncated or stderr.truncated
+
+
+def capture(
+    proc: subprocess.Popen,
+    input: Optional[bytes],
+    timeout: float,
+    limit: int,
+) -> CapturedOutput:
+    """
+    Feed `input` to a binary-mode Popen with piped stdin/stdout/stderr,
+    collect its bounded output and wait for it to exit.
+
+    On timeout the process is killed and subprocess.TimeoutExpired is
+    raised with the partial output in `output` / `stderr` and the
+    truncation flag in `truncated`.
+    """
+    stdout, stderr = BoundedBuffer(limit), BoundedBuffer(limit)
+    deadline = time.monotonic() + timeout
+
+    if os.name == "nt":
+        finished = _pump_with_threads(proc, input or b"", stdout, stderr, deadline)
+    else:
+        finished = _pump_with_selector(proc, input or b"", stdout, stderr, deadline)
+
+    if finished:
+        try:
+            proc.wait(max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            finished = False
+
+    if not finished:
+        proc.kill()
+        proc.wait()
+        captured = CapturedOutput(stdout, stderr)
+        error = subprocess.TimeoutExpired(
+            proc.args, timeout, output=captured.stdout, stderr=captured.stderr
+        )
+        error.truncated = captured.truncated
+        raise error
+
+    return CapturedOutput(stdout, stderr)
+
+
+def _pump_with_selector(proc, input_data, stdout, stderr, deadline) -> bool:
+    """Returns False if the deadline passed before both streams closed."""
+    buffers = {proc.stdout: stdout, proc.stderr: stderr}
+    view = memoryview(input_data)
+    offset = 0
+
+    with selectors.DefaultSelector() as selector:
+        for stream in buffers:
+            selector.register(stream, selectors.EVENT_READ)
+
+        if proc.stdin is not None:
+            if view:
+                os.set_blocking(proc.stdin.fileno(), False)
+                selector.register(proc.stdin, selectors.EVENT_WRITE)
+            else:
+                _close(proc.stdin)
+
+        finished = True
+        while len(selector.get_map()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                finished = False
+                break
+
+            for key, _ in selector.select(remaining):
+                stream = key.fileobj
+
+                if stream is proc.stdin:
+                    try:
+                        offset += os.write(
+                            stream.fileno(), view[offset : offset + WRITE_CHUNK]
+                        )
+                    except BlockingIOError:
+                        continue
+                    except BrokenPipeError:
+                        offset = len(view)
+                    if offset >= len(view):
+                        selector.unregister(stream)
+                        _close(stream)
+                    continue
+
+                chunk = os.read(stream.fileno(), READ_CHUNK)
+                if chunk:
+                    buffers[stream].write(chunk)
+                else:
+                    selector.unregister(stream)
+
+        if not finished:
+            # Whatever is already sitting in the pipes is still useful.
+            proc.kill()
+            drain_until = time.monotonic() + DRAIN_AFTER_KILL
+            while len(selector.get_map()) and time.monotonic() < drain_until:
+                for key, _ in selector.select(drain_until - time.monotonic()):
+                    if key.fileobj is proc.stdin:
+                        selector.unregister(key.fileobj)
+                        continue
+                    chunk = os.read(key.fileobj.fileno(), READ_CHUNK)
+                    if chunk:
+                        buffers[key.fileobj].write(chunk)
+                    else:
+                        selector.unregister(key.fileobj)
+
+    for stream in (proc.stdin, proc.stdout, proc.stderr):
+        _close(stream)
+    return finished
+
+
+def _pump_with_threads(proc, input_data, stdout, stderr, deadline) -> bool:
+    """Fallback for platforms where pipes cannot be selected on (Windows)."""
+
+    def read_into(stream, buffer):
+        for chunk in iter(lambda: stream.read1(READ_CHUNK), b""):
+            buffer.write(chunk)
+
+    def write_input():
+        try:
+            if input_data:
+                proc.stdin.write(input_data)
+        except (BrokenPipeError, OSError):
+            pass
+        finally:
+            _close(proc.stdin)
+
+    threads = [
+        threading.Thread(target=read_into, args=(proc.stdout, stdout), daemon=True),
+        threading.Thread(target=read_into, args=(proc.stderr, stderr), daemon=True),
+    ]
+    if proc.stdin is not None:
+        threads.append(threading.Thread(target=write_input, daemon=True))
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+
+    return not any(thread.is_alive() for thread in threads)
+
+
+def _close(stream) -> None:
+    try:
+        if stream is not None:
+            stream.close()
+    except OSError:
+        pass
@@ -0,0 +1,305 @@
+"""
+Pool of pre-started Python interpreters.
+
+Each worker is a fresh `python` process that has already paid the
+interpreter startup cost and blocks reading a snippet from its stdin.
+A worker runs exactly one snippet and then exits; the pool replaces it
+in the background so the next request finds a warm interpreter. Each
+worker runs in its own scratch directory, which is emptied and returned
+to the scratch area when the worker is done.
+"""
+
+import atexit
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from services.config import (
+    PYTHON_POOL_SIZE,
+    PYTHON_POOL_MAX_IDLE,
+    PYTHON_POOL_FALLBACK,
+    OUTPUT_CAPTURE_LIMIT,
+)
+from services.output_capture import capture
+from services.sandbox_limits import read_usage_report, sandbox_limits
+from services.scratch import scratch_area
+
+SNIPPET_FILENAME = "main.py"
+
+# Protocol: one line with the byte length of the snippet, then the snippet.
+# When the worker exits it writes "<peak RSS (VmHWM) KiB> <CPU time usec>"
+# to the file descriptor in argv[3], if there is one (see read_usage_report()).
+WORKER_SOURCE = r"""
+import sys
+
+def _report_usage(fd):
+    try:
+        import os
+        times = os.times()
+        cpu_usec = int((times.user + times.system) * 1e6)
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    report = f"{line.split()[1]} {cpu_usec}"
+                    os.write(fd, report.encode("ascii"))
+                    break
+    except Exception:
+        pass
+
+def _run():
+    header = sys.stdin.buffer.readline()
+    if not header.strip():
+        return
+    source = sys.stdin.buffer.read(int(header)).decode("utf-8")
+    filename, script_dir = sys.argv[1], sys.argv[2]
+    del sys.argv[1:]
+    sys.argv[0] = filename
+    sys.path[0] = script_dir
+
+    import linecache
+    import traceback
+    # Every line needs its "\n" for 3.11+ traceback carets to line up.
+    lines = [
+        line if line.endswith("\n") else line + "\n"
+        for line in source.splitlines(True)
+    ]
+    linecache.cache[filename] = (len(source), None, lines, filename)
+
+    try:
+        code = compile(source, filename, "exec")
+    except SyntaxError as exc:
+        if exc.lineno and exc.lineno <= len(lines):
+            exc.text = lines[exc.lineno - 1]
+        traceback.print_exception(exc.with_traceback(None))
+        raise SystemExit(1)
+
+    import types
+    main_module = types.ModuleType("__main__")
+    main_module.__file__ = filename
+    sys.modules["__main__"] = main_module
+    try:
+        exec(code, main_module.__dict__)
+    except SystemExit:
+        raise
+    except BaseException as exc:
+        traceback.print_exception(exc.with_traceback(exc.__traceback__.tb_next))
+        raise SystemExit(1)
+
+_report_fd = int(sys.argv[3])
+try:
+    _run()
+finally:
+    if _report_fd >= 0:
+        _report_usage(_report_fd)
+"""
+
+
+class WarmPythonPool:
+    """Keeps `size` idle interpreters ready to run one snippet each."""
+
+    def __init__(
+        self,
+        size: int,
+        max_idle: float,
+        fallback: bool = True,
+        executable: str = "python",
+    ):
+        self.size = size
+        self.max_idle = max_idle
+        self.fallback = fallback
+        self.executable = executable
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+        self._closed = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and not self._closed
+
+    def _spawn(self) -> subprocess.Popen:
+        scratch_dir = scratch_area.acquire()
+        report_read, report_write = os.pipe() if os.name == "posix" else (-1, -1)
+
+        try:
+            worker = subprocess.Popen(
+                [
+                    self.executable,
+                    "-c",
+                    WORKER_SOURCE,
+                    SNIPPET_FILENAME,
+                    scratch_dir,
+                    str(report_write),
+                ],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=scratch_dir,
+                pass_fds=(report_write,) if report_write >= 0 else (),
+            )
+        except Exception:
+            scratch_area.release(scratch_dir)
+            if report_read >= 0:
+                os.close(report_read)
+            raise
+        finally:
+            if report_write >= 0:
+                os.close(report_write)
+
+        # The idle worker is limited before it is handed a snippet.
+        sandbox_limits.limit_process(worker.pid)
+        if report_read >= 0:
+            os.set_blocking(report_read, False)
+        worker.scratch_dir = scratch_dir
+        worker.report_fd = report_read
+        return worker
+
+    def start(self) -> None:
+        """Start filling the pool, so the first request finds a warm worker."""
+        if self.enabled:
+            self._schedule_refill()
+
+    def _refill(self) -> None:
+        try:
+            while True:
+                with self._lock:
+                    if self._closed or len(self._idle) >= self.size:
+                        return
+                worker = self._spawn()
+                with self._lock:
+                    closed = self._closed
+                    if not closed:
+                        self._idle.append((worker, time.monotonic()))
+                if closed:
+                    _discard(worker)
+                    return
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def _schedule_refill(self) -> None:
+        with self._lock:
+            if self._refilling or self._closed:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill, daemon=True).start()
+
+    def acquire(self, block: bool = False) -> Optional[subprocess.Popen]:
+        """
+        Take an idle worker out of the pool.
+        Returns None if none is ready, unless `block` is set, in which
+        case a worker is started on the spot.
+        """
+        worker = None
+        stale = []
+        now = time.monotonic()
+
+        with self._lock:
+            while self._idle:
+                candidate, started_at = self._idle.popleft()
+                if candidate.poll() is not None or now - started_at > self.max_idle:
+                    stale.append(candidate)
+                    continue
+                worker = candidate
+                break
+
+        for candidate in stale:
+            _discard(candidate)
+
+        self._schedule_refill()
+
+        if worker is None and block:
+            worker = self._spawn()
+
+        return worker
+
+    def run(
+        self, code: str, timeout: float, stdin: Optional[str] = None
+    ) -> Optional[subprocess.CompletedProcess]:
+        """
+        Run a snippet on a warm worker, with `stdin` as its input.
+        Returns None if no worker was ready and cold-spawn fallback is on.
+        Raises subprocess.TimeoutExpired (with partial output) like
+        sandbox_limits.run(), and returns the same `usage` and
+        `truncated` attributes.
+        """
+        worker = self.acquire(block=not self.fallback)
+        if worker is None:
+            return None
+
+        source = code.encode("utf-8")
+        payload = f"{len(source)}\n".encode("ascii") + source
+        if stdin:
+            payload += stdin.encode("utf-8")
+
+        group = sandbox_limits.create_group()
+        sandbox_limits.attach(group, worker.pid)
+
+        try:
+            output = capture(worker, payload, timeout, OUTPUT_CAPTURE_LIMIT)
+            usage = sandbox_limits.usage(group, _read_usage(worker))
+        except subprocess.TimeoutExpired:
+            _discard(worker)
+            raise
+        finally:
+            sandbox_limits.remove_group(group)
+            _release_worker(worker)
+
+        completed = subprocess.CompletedProcess(
+            worker.args, worker.returncode, output.stdout, output.stderr
+        )
+        completed.truncated = output.truncated
+        completed.usage = usage
+        return completed
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+            workers = [worker for worker, _ in self._idle]
+            self._idle.clear()
+
+        for worker in workers:
+            _discard(worker)
+
+
+def _discard(worker: subprocess.Popen) -> None:
+    try:
+        worker.kill()
+        worker.wait()
+    except Exception:
+        pass
+    for stream in (worker.stdin, worker.stdout, worker.stderr):
+        try:
+            stream.close()
+        except Exception:
+            pass
+    _release_worker(worker)
+
+
+def _read_usage(worker: subprocess.Popen) -> Optional[dict]:
+    """Peak RSS and CPU time the worker reported on exit, if any."""
+    report_fd = getattr(worker, "report_fd", -1)
+    if report_fd < 0:
+        return None
+    return read_usage_report(report_fd)
+
+
+def _release_worker(worker: subprocess.Popen) -> None:
+    scratch_dir = getattr(worker, "scratch_dir", None)
+    if scratch_dir:
+        worker.scratch_dir = None
+        scratch_area.release(scratch_dir)
+
+    report_fd = getattr(worker, "report_fd", -1)
+    if report_fd >= 0:
+        worker.report_fd = -1
+        os.close(report_fd)
+
+
+python_pool = WarmPythonPool(
+    PYTHON_POOL_SIZE, PYTHON_POOL_MAX_IDLE, fallback=PYTHON_POOL_FALLBACK
+)
+atexit.register(python_pool.shutdown)
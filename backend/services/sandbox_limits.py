@@ -0,0 +1,480 @@
+"""
+Resource limits and accounting for sandboxed executions.
+
+Every snippet run gets CPU-time, address-space and file-size limits
+through rlimits. When a delegated cgroup v2 directory is configured,
+each run also gets its own child cgroup with memory.max and pids.max,
+which (unlike rlimits) cover every process the snippet forks and are
+accounted exactly. The process count is only limited through pids.max:
+RLIMIT_NPROC counts every process of the server's user, so it would
+limit the server as a whole rather than each run.
+
+No Python runs in the child between fork and exec, which is unsafe in
+a threaded server and rules out CPython's vfork fast path. Runs are
+started through a tiny C wrapper (sandbox-exec, compiled once with
+CPP_COMPILER) that forks the program, sets its limits and cgroup before
+exec, waits for it and reports the program's own peak RSS and CPU time
+through a pipe. The program is forked from the small wrapper image, so
+its ru_maxrss does not include the server's footprint as it would for a
+child of the server. Without a compiler, limits are applied with
+prlimit() right after spawn and peak RSS is only known with a cgroup.
+
+Warm Python workers are spawned idle, limited with prlimit() before
+they receive a snippet, and report their own VmHWM and CPU time on exit.
+"""
+
+import hashlib
+import os
+import signal
+import subprocess
+import threading
+import uuid
+from typing import Optional
+
+from services.config import (
+    SANDBOX_LIMITS_BACKEND,
+    SANDBOX_CPU_TIME_LIMIT,
+    SANDBOX_MEMORY_LIMIT_MB,
+    SANDBOX_FILE_SIZE_LIMIT_MB,
+    SANDBOX_MAX_PROCESSES,
+    SANDBOX_CGROUP_ROOT,
+    CPP_COMPILER,
+    CPP_CACHE_DIR,
+    OUTPUT_CAPTURE_LIMIT,
+)
+from services.output_capture import capture
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+# sandbox-exec REPORT_FD CGROUP_PROCS CPU_SECONDS AS_BYTES FSIZE_BYTES -- PROGRAM ARGS...
+# "-" / 0 mean none. Writes "<peak rss KiB> <cpu usec>" to REPORT_FD and exits
+# like the program (re-raising the signal that killed it).
+EXEC_WRAPPER_SOURCE = r"""
+#include <errno.h>
+#include <fcntl.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/prctl.h>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+static void set_limit(int which, unsigned long long soft, unsigned long long hard) {
+    if (soft == 0) return;
+    struct rlimit limit;
+    limit.rlim_cur = soft;
+    limit.rlim_max = hard;
+    setrlimit(which, &limit);
+}
+
+int main(int argc, char **argv) {
+    if (argc < 8 || strcmp(argv[6], "--") != 0) {
+        fprintf(stderr, "sandbox-exec: bad arguments\n");
+        return 126;
+    }
+    int report_fd = atoi(argv[1]);
+    pid_t parent = getpid();
+
+    pid_t pid = fork();
+    if (pid < 0) {
+        perror("sandbox-exec: fork");
+        return 126;
+    }
+    if (pid == 0) {
+        /* The program dies with the wrapper, e.g. when a timeout kills it. */
+        prctl(PR_SET_PDEATHSIG, SIGKILL);
+        if (getppid() != parent) _exit(126);
+        if (report_fd >= 0) close(report_fd);
+        if (strcmp(argv[2], "-") != 0) {
+            int fd = open(argv[2], O_WRONLY);
+            if (fd < 0 || write(fd, "0", 1) != 1) _exit(126);
+            close(fd);
+        }
+        unsigned long long cpu = strtoull(argv[3], NULL, 10);
+        unsigned long long as = strtoull(argv[4], NULL, 10);
+        unsigned long long fsize = strtoull(argv[5], NULL, 10);
+        set_limit(RLIMIT_CPU, cpu, cpu + 1);
+        set_limit(RLIMIT_AS, as, as);
+        set_limit(RLIMIT_FSIZE, fsize, fsize);
+        execvp(argv[7], argv + 7);
+        perror(argv[7]);
+        _exit(127);
+    }
+
+    int status;
+    struct rusage usage;
+    while (wait4(pid, &status, 0, &usage) < 0) {
+        if (errno != EINTR) return 126;
+    }
+
+    if (report_fd >= 0) {
+        long long cpu_usec =
+            (long long)(usage.ru_utime.tv_sec + usage.ru_stime.tv_sec) * 1000000LL +
+            usage.ru_utime.tv_usec + usage.ru_stime.tv_usec;
+        dprintf(report_fd, "%ld %lld", usage.ru_maxrss, cpu_usec);
+        close(report_fd);
+    }
+
+    if (WIFSIGNALED(status)) {
+        int sig = WTERMSIG(status);
+        struct rlimit no_core = {0, 0};
+        sigset_t set;
+        setrlimit(RLIMIT_CORE, &no_core);
+        signal(sig, SIG_DFL);
+        sigemptyset(&set);
+        sigaddset(&set, sig);
+        sigprocmask(SIG_UNBLOCK, &set, NULL);
+        kill(getpid(), sig);
+        return 128 + sig;
+    }
+    return WEXITSTATUS(status);
+}
+"""
+
+
+def read_usage_report(fd: int) -> Optional[dict]:
+    """
+    {"peak_rss_kb", "cpu_time"} from a "<KiB> <usec>" report written to
+    the read end `fd` of a pipe, or None if nothing was written.
+    """
+    try:
+        peak_kb, cpu_usec = os.read(fd, 64).split()
+        return {"peak_rss_kb": int(peak_kb), "cpu_time": int(cpu_usec) / 1e6}
+    except (OSError, ValueError):
+        return None
+
+
+class SandboxLimits:
+    """Applies per-execution limits with rlimits and, optionally, cgroup v2."""
+
+    def __init__(
+        self,
+        backend: str,
+        cpu_time: float,
+        memory_mb: int,
+        file_size_mb: int,
+        max_processes: int,
+        cgroup_root: str = "",
+    ):
+        self.cpu_time = cpu_time
+        self.memory_bytes = memory_mb * MB
+        self.file_size_bytes = file_size_mb * MB
+        self.max_processes = max_processes
+        self.cgroup_root = cgroup_root
+        self.backend = self._select_backend(backend)
+        self._wrapper_lock = threading.Lock()
+        self._wrapper_built = False
+        self._wrapper_path: Optional[str] = None
+
+    def _select_backend(self, requested: str) -> str:
+        if requested == "off":
+            return "off"
+        if requested in ("auto", "cgroup") and self._cgroup_usable():
+            return "cgroup"
+        if resource is not None:
+            return "rlimit"
+        return "off"
+
+    def _cgroup_usable(self) -> bool:
+        if not self.cgroup_root or not os.access(self.cgroup_root, os.W_OK):
+            return False
+
+        try:
+            with open(os.path.join(self.cgroup_root, "cgroup.controllers")) as f:
+                available = f.read().split()
+            with open(os.path.join(self.cgroup_root, "cgroup.subtree_control"), "w") as f:
+                f.write("+memory +pids")
+        except OSError:
+            return False
+
+        return "memory" in available and "pids" in available
+
+    def _rlimits(self) -> list:
+        """(resource name, soft, hard) for each rlimit to apply."""
+        if self.backend == "off":
+            return []
+
+        limits = []
+        if self.cpu_time > 0:
+            seconds = int(self.cpu_time + 0.999)
+            limits.append(("RLIMIT_CPU", seconds, seconds + 1))
+        if self.backend == "rlimit" and self.memory_bytes > 0:
+            # The cgroup's memory.max covers this for the whole process tree.
+            limits.append(("RLIMIT_AS", self.memory_bytes, self.memory_bytes))
+        if self.file_size_bytes > 0:
+            limits.append(("RLIMIT_FSIZE", self.file_size_bytes, self.file_size_bytes))
+        return limits
+
+    def limit_process(self, pid: int) -> None:
+        """
+        Apply the rlimits to a running process with prlimit(), e.g. an idle
+        warm worker before it is handed a snippet.
+        """
+        if resource is None or not hasattr(resource, "prlimit"):
+            return
+        for name, soft, hard in self._rlimits():
+            try:
+                resource.prlimit(pid, getattr(resource, name), (soft, hard))
+            except (ValueError, OSError):
+                pass
+
+    def exec_wrapper(self) -> Optional[str]:
+        """Path of the compiled sandbox-exec wrapper, or None if unavailable."""
+        if self._wrapper_built:
+            return self._wrapper_path
+
+        with self._wrapper_lock:
+            if not self._wrapper_built:
+                self._wrapper_path = _build_exec_wrapper()
+                self._wrapper_built = True
+        return self._wrapper_path
+
+    def spawn(
+        self, args: list, group: Optional[str] = None, **popen_kwargs
+    ) -> subprocess.Popen:
+        """
+        Start `args` with the limits applied (and in `group`, if given).
+        The Popen gets a `report_fd` attribute, the read end of the
+        wrapper's usage report (-1 without the wrapper).
+        """
+        wrapper = self.exec_wrapper()
+        if wrapper is None:
+            proc = subprocess.Popen(args, **popen_kwargs)
+            self.limit_process(proc.pid)
+            self.attach(group, proc.pid)
+            proc.report_fd = -1
+            return proc
+
+        limits = {name: soft for name, soft, _ in self._rlimits()}
+        report_read, report_write = os.pipe()
+        command = [
+            wrapper,
+            str(report_write),
+            os.path.join(group, "cgroup.procs") if group else "-",
+            str(limits.get("RLIMIT_CPU", 0)),
+            str(limits.get("RLIMIT_AS", 0)),
+            str(limits.get("RLIMIT_FSIZE", 0)),
+            "--",
+            *args,
+        ]
+        try:
+            proc = subprocess.Popen(command, pass_fds=(report_write,), **popen_kwargs)
+        except Exception:
+            os.close(report_read)
+            raise
+        finally:
+            os.close(report_write)
+
+        proc.args = args
+        proc.report_fd = report_read
+        return proc
+
+    def create_group(self) -> Optional[str]:
+        """Create a child cgroup for one execution (cgroup backend only)."""
+        if self.backend != "cgroup":
+            return None
+
+        path = os.path.join(self.cgroup_root, f"run-{uuid.uuid4().hex}")
+        try:
+            os.mkdir(path)
+            if self.memory_bytes > 0:
+                _write(path, "memory.max", self.memory_bytes)
+                _write(path, "memory.swap.max", 0, ignore_errors=True)
+            if self.max_processes > 0:
+                _write(path, "pids.max", self.max_processes)
+        except OSError:
+            self.remove_group(path)
+            return None
+        return path
+
+    def attach(self, group: Optional[str], pid: int) -> None:
+        """Move an already running process (e.g. a pooled worker) into a group."""
+        if group:
+            _write(group, "cgroup.procs", pid, ignore_errors=True)
+
+    def remove_group(self, group: Optional[str]) -> None:
+        if not group:
+            return
+        _write(group, "cgroup.kill", 1, ignore_errors=True)
+        try:
+            os.rmdir(group)
+        except OSError:
+            pass
+
+    def usage(
+        self, group: Optional[str] = None, measured: Optional[dict] = None
+    ) -> dict:
+        """
+        Peak RSS (KiB) and CPU time (seconds) of a finished execution,
+        plus whether the cgroup killed it for exceeding memory.max.
+        `measured` is what the run reported about itself (see
+        read_usage_report()); the cgroup's figures win when larger.
+        """
+        peak_rss_kb = measured.get("peak_rss_kb") if measured else None
+        cpu_time = measured.get("cpu_time") if measured else None
+
+        oom_killed = False
+        if group:
+            peak = _read_int(group, "memory.peak")
+            if peak is not None:
+                peak_rss_kb = max(peak_rss_kb or 0, peak // 1024)
+            usage_usec = _read_stat(group, "cpu.stat", "usage_usec")
+            if usage_usec is not None:
+                cpu_time = max(cpu_time or 0.0, usage_usec / 1e6)
+            oom_killed = bool(_read_stat(group, "memory.events", "oom_kill"))
+
+        return {
+            "peak_rss_kb": peak_rss_kb,
+            "cpu_time": cpu_time,
+            "oom_killed": oom_killed,
+        }
+
+    def describe_violation(self, returncode: int, usage: dict) -> Optional[str]:
+        """Turn a limit-induced exit into an error message, if it was one."""
+        if usage.get("oom_killed"):
+            return "Memory limit exceeded"
+        if returncode == -getattr(signal, "SIGXCPU", -1):
+            return "CPU time limit exceeded"
+        if returncode == -getattr(signal, "SIGXFSZ", -1):
+            return "Output file size limit exceeded"
+        return None
+
+    def run(
+        self,
+        args: list,
+        timeout: float,
+        cwd: Optional[str] = None,
+        input: Optional[str] = None,
+    ) -> subprocess.CompletedProcess:
+        """
+        subprocess.run() with limits applied. The program's stdin is
+        `input` (empty if None). Output is captured with
+        output_capture.capture(), so a timeout carries partial output.
+        The CompletedProcess gets `usage` (see usage()) and `truncated`
+        attributes.
+        """
+        group = self.create_group()
+        report_fd = -1
+
+        try:
+            with self.spawn(
+                args,
+                group,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=cwd,
+            ) as proc:
+                report_fd = proc.report_fd
+                output = capture(
+                    proc,
+                    (input or "").encode("utf-8"),
+                    timeout,
+                    OUTPUT_CAPTURE_LIMIT,
+                )
+
+            completed = subprocess.CompletedProcess(
+                args, proc.returncode, output.stdout, output.stderr
+            )
+            completed.truncated = output.truncated
+            measured = read_usage_report(report_fd) if report_fd >= 0 else None
+            completed.usage = self.usage(group, measured)
+            return completed
+
+        finally:
+            if report_fd >= 0:
+                os.close(report_fd)
+            self.remove_group(group)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "cpu_time": self.cpu_time,
+            "memory_bytes": self.memory_bytes,
+            "file_size_bytes": self.file_size_bytes,
+            "max_processes": self.max_processes,
+            "exec_wrapper": self._wrapper_path is not None,
+        }
+
+
+def _build_exec_wrapper() -> Optional[str]:
+    """
+    Compile sandbox-exec once per source version, into a subdirectory of
+    the C++ cache dir (eviction only scans the top level).
+    """
+    if os.name != "posix":
+        return None
+
+    digest = hashlib.sha256(
+        f"{CPP_COMPILER}\0{EXEC_WRAPPER_SOURCE}".encode("utf-8")
+    ).hexdigest()[:16]
+    tools_dir = os.path.join(CPP_CACHE_DIR, "tools")
+    path = os.path.join(tools_dir, f"sandbox-exec-{digest}")
+    if os.access(path, os.X_OK):
+        return path
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(tools_dir, exist_ok=True)
+        subprocess.run(
+            [CPP_COMPILER, "-O2", "-x", "c++", "-", "-o", tmp_path],
+            input=EXEC_WRAPPER_SOURCE,
+            capture_output=True,
+            text=True,
+            timeout=60,
+            check=True,
+        )
+        os.replace(tmp_path, path)
+    except (OSError, subprocess.SubprocessError):
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        return None
+    return path
+
+
+def _write(group: str, name: str, value, ignore_errors: bool = False) -> None:
+    try:
+        with open(os.path.join(group, name), "w") as f:
+            f.write(str(value))
+    except OSError:
+        if not ignore_errors:
+            raise
+
+
+def _read_int(group: str, name: str) -> Optional[int]:
+    try:
+        with open(os.path.join(group, name)) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _read_stat(group: str, name: str, key: str) -> Optional[int]:
+    try:
+        with open(os.path.join(group, name)) as f:
+            for line in f:
+                field, _, value = line.partition(" ")
+                if field == key:
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+sandbox_limits = SandboxLimits(
+    SANDBOX_LIMITS_BACKEND,
+    SANDBOX_CPU_TIME_LIMIT,
+    SANDBOX_MEMORY_LIMIT_MB,
+    SANDBOX_FILE_SIZE_LIMIT_MB,
+    SANDBOX_MAX_PROCESSES,
+    SANDBOX_CGROUP_ROOT,
+)
@@ -1,3 +1,9 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from services.static_analyzer import analyze_code
+
 BLOCKED_KEYWORDS = {
     "import os",
     "import sys",
@@ -19,17 +25,132 @@ BLOCKED_KEYWORDS = {
     "fork(",
 }
 
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def _keyword_pattern(keyword: str) -> Tuple[List[str], str]:
+    """
+    The keyword's tokens, and a regex for what follows its first token.
+
+    Keywords are split into tokens; any run of whitespace may separate
+    two words (`import  os`) and optional whitespace may surround
+    punctuation (`os . system`). A keyword ending in a word character
+    must end on a token boundary, so `from os` matches `from os.path`
+    but not `from oscar`.
+    """
+    tokens = TOKEN_PATTERN.findall(keyword.lower())
+    rest = []
+    for previous, token in zip(tokens, tokens[1:]):
+        word_gap = previous[-1].isalnum() and token[0].isalnum()
+        rest.append(r"\s+" if word_gap else r"\s*")
+        rest.append(re.escape(token))
+    if re.search(r"\w$", keyword):
+        rest.append(r"(?!\w)")
+    return tokens, "".join(rest)
+
+
+def _build_matcher(keywords) -> Tuple["re.Pattern[str]", Dict[str, str], list]:
+    """
+    Compile all keywords into a single regex so the text is scanned once,
+    plus one regex per first token (see _first_matches()). Keywords sharing
+    a first token are grouped behind it, which keeps the alternation cheap
+    to try at each offset.
+    """
+    by_first_token = defaultdict(list)
+    needed_chars = {}
+    group_keywords = {}
+
+    for index, keyword in enumerate(sorted(keywords, key=lambda k: (-len(k), k))):
+        tokens, rest = _keyword_pattern(keyword)
+        group = f"k{index}"
+        group_keywords[group] = keyword
+        by_first_token[tokens[0]].append(f"(?P<{group}>{rest})")
+        # Punctuation every keyword of the group needs.
+        chars = {token for token in tokens if len(token) == 1 and not token.isalnum()}
+        needed_chars[tokens[0]] = needed_chars.get(tokens[0], chars) & chars
+
+    branches = [
+        (
+            re.escape(first) + "(?:" + "|".join(alternatives) + ")",
+            sorted(needed_chars[first]),
+        )
+        for first, alternatives in sorted(
+            by_first_token.items(), key=lambda item: -len(item[0])
+        )
+    ]
+    matcher = re.compile("|".join(branch for branch, _ in branches))
+    branch_matchers = [(re.compile(branch), chars) for branch, chars in branches]
+    return matcher, group_keywords, branch_matchers
+
+
+_MATCHER, _GROUP_KEYWORDS, _BRANCHES = _build_matcher(BLOCKED_KEYWORDS)
+
 
-def is_code_safe(code: str) -> tuple[bool, str | None]:
+def _first_matches(text: str) -> Iterator["re.Match[str]"]:
     """
+    The first match of each group of keywords sharing a first token.
+
+    One regex per group is faster than the combined one: re finds a
+    pattern's literal prefix (the first token) with a fast scan instead of
+    trying the alternation at every offset, and a group is skipped
+    without a scan when punctuation all its keywords need (a memchr) is
+    missing from the text.
+    """
+    for pattern, chars in _BRANCHES:
+        if all(char in text for char in chars):
+            match = pattern.search(text)
+            if match:
+                yield match
+
+
+def _prepare(code: str) -> Tuple[str, int]:
+    # Lowercasing first is much faster than re.IGNORECASE, but a few
+    # characters change length when lowercased, which would shift offsets.
+    lowered = code.lower()
+    if len(lowered) == len(code):
+        return lowered, 0
+    return code, re.IGNORECASE
+
+
+def find_blocked_keywords(code: str) -> List[Tuple[str, int]]:
+    """
+    Returns every blocked keyword found in the code as
+    (keyword, offset) pairs, in order of appearance.
+    """
+    text, flags = _prepare(code)
+    # Nothing can match before the earliest first match of any group.
+    if flags:
+        start = 0
+    else:
+        start = min((match.start() for match in _first_matches(text)), default=-1)
+    if start < 0:
+        return []
+    matcher = _MATCHER if not flags else re.compile(_MATCHER.pattern, flags)
+
+    return [
+        (_GROUP_KEYWORDS[match.lastgroup], match.start())
+        for match in matcher.finditer(text, start)
+    ]
+
+
+def is_code_safe(code: str, language: Optional[str] = None) -> tuple[bool, str | None]:
+    """
+    Checks the keyword list, then (when the language is known) the
+    static analyzer for that language.
+
     Returns:
         (True, None) if safe
         (False, reason) if dangerous
     """
-    lowered = code.lower()
+    text, flags = _prepare(code)
+    if not flags:
+        match = next(_first_matches(text), None)
+    else:
+        match = re.compile(_MATCHER.pattern, flags).search(text)
+    if match:
+        return False, f"Blocked keyword detected: {_GROUP_KEYWORDS[match.lastgroup]}"
 
-    for keyword in BLOCKED_KEYWORDS:
-        if keyword in lowered:
-            return False, f"Blocked keyword detected: {keyword}"
+    if language:
+        return analyze_code(language, code)
 
     return True, None
@@ -0,0 +1,214 @@
+"""
+Managed scratch directories for executions.
+
+Instead of creating and deleting a temp file (and, for C++, a temp
+directory) per request, executions lease a directory from a small pool
+under SCRATCH_ROOT, which defaults to tmpfs (/dev/shm) when available.
+Released directories are emptied and reused, so the hot path never
+creates or removes directories.
+
+Directory names carry the server's PID. A janitor thread removes
+directories left behind by server processes that no longer exist, and
+directories this process abandoned (e.g. because a killed run left
+files that could not be removed).
+"""
+
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from services.config import (
+    SCRATCH_ROOT,
+    SCRATCH_MAX_IDLE_DIRS,
+    SCRATCH_JANITOR_INTERVAL,
+    SCRATCH_ORPHAN_AGE,
+)
+
+
+def default_scratch_root() -> str:
+    """
+    tmpfs if the host has a writable /dev/shm that allows exec (Docker
+    mounts it noexec, which would break compiled C++ binaries), else the
+    system temp dir.
+    """
+    import tempfile
+
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        try:
+            noexec = bool(os.statvfs("/dev/shm").f_flag & os.ST_NOEXEC)
+        except (OSError, AttributeError):
+            noexec = True
+        if not noexec:
+            return os.path.join("/dev/shm", "neurodebug-scratch")
+    return os.path.join(tempfile.gettempdir(), "neurodebug", "scratch")
+
+
+class ScratchArea:
+    """Pool of reusable, per-execution scratch directories."""
+
+    def __init__(
+        self,
+        root: str,
+        max_idle: int,
+        janitor_interval: float,
+        orphan_age: float,
+    ):
+        self.root = root
+        self.max_idle = max_idle
+        self.janitor_interval = janitor_interval
+        self.orphan_age = orphan_age
+        self._lock = threading.Lock()
+        self._idle: deque = deque()
+        self._leased = set()
+        self._sequence = 0
+        self._janitor_started = False
+        self._counters = {"created": 0, "reused": 0, "discarded": 0, "orphans_removed": 0}
+
+    def acquire(self) -> str:
+        """Take an empty scratch directory; the caller must release() it."""
+        self._start_janitor()
+
+        with self._lock:
+            if self._idle:
+                path = self._idle.popleft()
+                self._leased.add(path)
+                self._counters["reused"] += 1
+                return path
+
+            self._sequence += 1
+            path = os.path.join(self.root, f"{os.getpid()}-{self._sequence}")
+            self._leased.add(path)
+            self._counters["created"] += 1
+
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def release(self, path: str) -> None:
+        """Empty a leased directory and put it back in the pool."""
+        reusable = _empty_directory(path)
+
+        with self._lock:
+            self._leased.discard(path)
+            if reusable and len(self._idle) < self.max_idle:
+                self._idle.append(path)
+                return
+            self._counters["discarded"] += 1
+
+        shutil.rmtree(path, ignore_errors=True)
+
+    @contextmanager
+    def lease(self) -> Iterator[str]:
+        path = self.acquire()
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def _start_janitor(self) -> None:
+        with self._lock:
+            if self._janitor_started or self.janitor_interval <= 0:
+                return
+            self._janitor_started = True
+
+        threading.Thread(target=self._janitor, daemon=True).start()
+
+    def _janitor(self) -> None:
+        while True:
+            try:
+                self.sweep()
+            except Exception:
+                pass
+            time.sleep(self.janitor_interval)
+
+    def sweep(self) -> int:
+        """Remove orphaned scratch directories. Returns how many were removed."""
+        with self._lock:
+            in_use = set(self._leased) | set(self._idle)
+
+        removed = 0
+        now = time.time()
+
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return 0
+
+        for entry in entries:
+            if entry.path in in_use or not entry.is_dir(follow_symlinks=False):
+                continue
+
+            owner = _owner_pid(entry.name)
+            if owner is not None and owner != os.getpid() and _pid_alive(owner):
+                continue
+
+            try:
+                age = now - entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                continue
+            if age < self.orphan_age:
+                continue
+
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+
+        if removed:
+            with self._lock:
+                self._counters["orphans_removed"] += removed
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "root": self.root,
+                "leased": len(self._leased),
+                "idle": len(self._idle),
+                **self._counters,
+            }
+
+
+def _empty_directory(path: str) -> bool:
+    """Remove everything inside `path`. Returns False if anything is left."""
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return False
+
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+        except OSError:
+            return False
+    return True
+
+
+def _owner_pid(name: str) -> Optional[int]:
+    prefix = name.split("-", 1)[0]
+    return int(prefix) if prefix.isdigit() else None
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill(pid, 0) would send CTRL_C_EVENT on Windows.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+scratch_area = ScratchArea(
+    SCRATCH_ROOT or default_scratch_root(),
+    SCRATCH_MAX_IDLE_DIRS,
+    SCRATCH_JANITOR_INTERVAL,
+    SCRATCH_ORPHAN_AGE,
+)
@@ -0,0 +1,265 @@
+"""
+Bounded stores for auto-retry sessions.
+
+Sessions are kept with a maximum count and an idle TTL, so a session
+whose stream never started or whose worker raised is dropped eventually
+instead of staying in memory for the life of the process. Evicted
+sessions are cancelled, so a still-running one stops after its current
+step. Listings are paged and use overview records that leave out
+attempts, code and output.
+
+The memory store keeps the live RetrySession objects and only serves the
+worker process that runs them. The SQLite store keeps a JSON snapshot of
+each session that the running worker refreshes after every step, so any
+uvicorn worker can list, read or delete it. Deleting a session's row is
+how another worker cancels it: the next save() fails and the running
+worker stops.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class SessionStore(ABC):
+    """Common counters; subclasses implement the storage."""
+
+    def __init__(self, max_sessions: int, ttl: float):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._counter_lock = threading.Lock()
+        self._counters = {"added": 0, "removed": 0, "expired": 0, "evicted": 0}
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        if amount:
+            with self._counter_lock:
+                self._counters[counter] += amount
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def add(self, session) -> None:
+        ...
+
+    @abstractmethod
+    def save(self, session) -> bool:
+        """
+        Record the session's progress. Returns False if it is no longer
+        stored (deleted, expired or evicted), meaning it should stop.
+        """
+
+    @abstractmethod
+    def get_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def remove(self, session_id: str) -> bool:
+        """Remove a session, cancelling it if it is still running."""
+
+    @abstractmethod
+    def list(self, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """A page of session overviews, oldest first, plus the total."""
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            stats = dict(self._counters)
+        stats["sessions"] = len(self)
+        stats["max_sessions"] = self.max_sessions
+        stats["ttl"] = self.ttl
+        return stats
+
+
+class MemorySessionStore(SessionStore):
+    """In-process session store bounded by count and idle time."""
+
+    def __init__(self, max_sessions: int, ttl: float):
+        super().__init__(max_sessions, ttl)
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Any]" = OrderedDict()
+
+    def _expired(self, session, now: float) -> bool:
+        return self.ttl > 0 and now - session.updated_at > self.ttl
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired sessions and trim to max_sessions; lock held."""
+        for session_id in [
+            session_id
+            for session_id, session in self._sessions.items()
+            if self._expired(session, now)
+        ]:
+            self._sessions.pop(session_id).cancelled = True
+            self._count("expired")
+
+        while len(self._sessions) > self.max_sessions:
+            _, session = self._sessions.popitem(last=False)
+            session.cancelled = True
+            self._count("evicted")
+
+    def add(self, session) -> None:
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._count("added")
+            self._sweep(time.time())
+
+    def save(self, session) -> bool:
+        return self._sessions.get(session.session_id) is session
+
+    def get_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self._expired(session, time.time()):
+                self._sessions.pop(session_id).cancelled = True
+                self._count("expired")
+                return None
+        return session.get_session_summary() if session is not None else None
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+
+        self._count("removed")
+        if not session.is_complete:
+            session.cancelled = True
+        return True
+
+    def list(self, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        with self._lock:
+            self._sweep(time.time())
+            total = len(self._sessions)
+            page: List[Any] = list(self._sessions.values())[offset : offset + limit]
+
+        return {
+            "sessions": [session.get_overview() for session in page],
+            "total": total,
+        }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session snapshots in a SQLite file, shared by all worker processes."""
+
+    def __init__(self, path: str, max_sessions: int, ttl: float):
+        super().__init__(max_sessions, ttl)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    overview TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions (created_at)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)"
+            )
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired rows and trim to max_sessions; lock and transaction held."""
+        if self.ttl > 0:
+            expired = self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,)
+            ).rowcount
+            self._count("expired", expired)
+
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        overflow = count - self.max_sessions
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY created_at LIMIT ?)",
+                (overflow,),
+            )
+            self._count("evicted", overflow)
+
+    def add(self, session) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions "
+                "(session_id, overview, summary, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    session.session_id,
+                    json.dumps(session.get_overview()),
+                    json.dumps(session.get_session_summary()),
+                    session.start_time,
+                    session.updated_at,
+                ),
+            )
+            self._count("added")
+            self._sweep(time.time())
+
+    def save(self, session) -> bool:
+        with self._lock, self._conn:
+            updated = self._conn.execute(
+                "UPDATE sessions SET overview = ?, summary = ?, updated_at = ? "
+                "WHERE session_id = ?",
+                (
+                    json.dumps(session.get_overview()),
+                    json.dumps(session.get_session_summary()),
+                    session.updated_at,
+                    session.session_id,
+                ),
+            ).rowcount
+        return updated > 0
+
+    def get_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, updated_at FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        summary, updated_at = row
+        if self.ttl > 0 and time.time() - updated_at > self.ttl:
+            return None
+        return json.loads(summary)
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            ).rowcount
+        self._count("removed", removed)
+        return removed > 0
+
+    def list(self, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        with self._lock, self._conn:
+            self._sweep(time.time())
+            (total,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+            rows = self._conn.execute(
+                "SELECT overview FROM sessions ORDER BY created_at LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+
+        return {"sessions": [json.loads(row[0]) for row in rows], "total": total}
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return count
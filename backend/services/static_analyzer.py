@@ -0,0 +1,368 @@
+"""
+Static safety analysis of submitted code.
+
+Python code is checked on its AST: imports, calls to dangerous builtins,
+reflective access (getattr with computed names, dunder attributes such as
+__subclasses__ or __globals__) and references to __builtins__. Code that
+does not parse (which is most code sent to a debugger) is checked on its
+token stream instead. C++ code is tokenized with comments and literals
+removed, then checked for blocked headers, calls and identifiers.
+
+Verdicts are memoized by a hash of the code, since the same source is
+checked by the route, by every AI fix and by the fix cache.
+"""
+
+import ast
+import hashlib
+import io
+import re
+import threading
+import tokenize
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+from services.config import STATIC_ANALYSIS_CACHE_SIZE
+
+Verdict = Tuple[bool, Optional[str]]
+
+PYTHON_BLOCKED_MODULES = {
+    "asyncio",
+    "builtins",
+    "code",
+    "codeop",
+    "ctypes",
+    "fcntl",
+    "gc",
+    "glob",
+    "http",
+    "importlib",
+    "inspect",
+    "io",
+    "marshal",
+    "mmap",
+    "multiprocessing",
+    "nt",
+    "os",
+    "pathlib",
+    "pickle",
+    "posix",
+    "pty",
+    "runpy",
+    "shutil",
+    "signal",
+    "socket",
+    "subprocess",
+    "sys",
+    "tempfile",
+    "urllib",
+}
+
+PYTHON_BLOCKED_CALLS = {
+    "__import__",
+    "breakpoint",
+    "compile",
+    "delattr",
+    "eval",
+    "exec",
+    "globals",
+    "locals",
+    "open",
+    "setattr",
+    "vars",
+}
+
+PYTHON_REFLECTION_CALLS = {"getattr", "hasattr"}
+
+PYTHON_BLOCKED_NAMES = {"__builtins__", "__loader__", "__spec__"}
+
+PYTHON_BLOCKED_ATTRIBUTES = {
+    "__base__",
+    "__bases__",
+    "__builtins__",
+    "__closure__",
+    "__code__",
+    "__dict__",
+    "__getattribute__",
+    "__globals__",
+    "__import__",
+    "__loader__",
+    "__mro__",
+    "__reduce__",
+    "__reduce_ex__",
+    "__spec__",
+    "__subclasses__",
+    "f_back",
+    "f_globals",
+    "f_locals",
+    "gi_frame",
+    "tb_frame",
+}
+
+CPP_BLOCKED_HEADERS = {
+    "cstdlib",
+    "dlfcn.h",
+    "fcntl.h",
+    "filesystem",
+    "fstream",
+    "spawn.h",
+    "stdlib.h",
+    "unistd.h",
+    "windows.h",
+}
+
+CPP_BLOCKED_HEADER_PREFIXES = ("sys/", "linux/", "asm/")
+
+CPP_BLOCKED_CALLS = {
+    "chmod",
+    "dlopen",
+    "execl",
+    "execle",
+    "execlp",
+    "execv",
+    "execve",
+    "execvp",
+    "execvpe",
+    "fopen",
+    "fork",
+    "freopen",
+    "kill",
+    "popen",
+    "putenv",
+    "rmdir",
+    "setenv",
+    "socket",
+    "syscall",
+    "system",
+    "unlink",
+    "vfork",
+}
+
+CPP_BLOCKED_IDENTIFIERS = {
+    "__asm__",
+    "asm",
+    "fstream",
+    "ifstream",
+    "ofstream",
+}
+
+CPP_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+    | (?P<include>^[ \t]*\#[ \t]*include[ \t]*[<"](?P<header>[^>"\n]+)[>"])
+    | (?P<string>R"(?P<delim>[^(\s]*)\(.*?\)(?P=delim)"|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    | (?P<identifier>[A-Za-z_]\w*)
+    | (?P<punct>[^\s\w])
+    """,
+    re.VERBOSE | re.DOTALL | re.MULTILINE,
+)
+
+
+def _module_root(name: Optional[str]) -> str:
+    return (name or "").split(".")[0]
+
+
+class _PythonPolicyVisitor(ast.NodeVisitor):
+    def __init__(self):
+        self.violation: Optional[str] = None
+
+    def _block(self, reason: str) -> None:
+        if self.violation is None:
+            self.violation = reason
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if _module_root(alias.name) in PYTHON_BLOCKED_MODULES:
+                self._block(f"Blocked import: {alias.name}")
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        if node.level == 0 and _module_root(node.module) in PYTHON_BLOCKED_MODULES:
+            self._block(f"Blocked import: {node.module}")
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        if isinstance(node.func, ast.Name):
+            name = node.func.id
+            if name in PYTHON_BLOCKED_CALLS:
+                self._block(f"Blocked call: {name}()")
+            elif name in PYTHON_REFLECTION_CALLS and len(node.args) >= 2:
+                attribute = node.args[1]
+                if not (
+                    isinstance(attribute, ast.Constant)
+                    and isinstance(attribute.value, str)
+                ):
+                    self._block(f"Blocked call: {name}() with a computed attribute name")
+                elif (
+                    _is_blocked_attribute(attribute.value)
+                    or attribute.value in PYTHON_BLOCKED_CALLS
+                ):
+                    self._block(f"Blocked attribute: {attribute.value}")
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if _is_blocked_attribute(node.attr):
+            self._block(f"Blocked attribute: {node.attr}")
+        self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if node.id in PYTHON_BLOCKED_NAMES:
+            self._block(f"Blocked name: {node.id}")
+
+
+def _is_blocked_attribute(name: str) -> bool:
+    return name in PYTHON_BLOCKED_ATTRIBUTES or name in PYTHON_BLOCKED_NAMES
+
+
+def _python_tokens(code: str) -> List[tokenize.TokenInfo]:
+    """Tokenize as far as possible; broken code still yields a prefix."""
+    tokens = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            tokens.append(token)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass
+    return tokens
+
+
+def _check_python_tokens(code: str) -> Verdict:
+    tokens = [
+        token
+        for token in _python_tokens(code)
+        if token.type in (tokenize.NAME, tokenize.OP)
+    ]
+
+    for index, token in enumerate(tokens):
+        following = tokens[index + 1].string if index + 1 < len(tokens) else ""
+        previous = tokens[index - 1].string if index > 0 else ""
+
+        if token.type != tokenize.NAME:
+            continue
+
+        if previous in ("import", "from") and token.string in PYTHON_BLOCKED_MODULES:
+            return False, f"Blocked import: {token.string}"
+        if token.string in PYTHON_BLOCKED_NAMES:
+            return False, f"Blocked name: {token.string}"
+        if previous == "." and _is_blocked_attribute(token.string):
+            return False, f"Blocked attribute: {token.string}"
+        if previous != "." and following == "(" and token.string in PYTHON_BLOCKED_CALLS:
+            return False, f"Blocked call: {token.string}()"
+
+    return True, None
+
+
+def analyze_python(code: str) -> Verdict:
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return _check_python_tokens(code)
+
+    visitor = _PythonPolicyVisitor()
+    visitor.visit(tree)
+
+    if visitor.violation:
+        return False, visitor.violation
+    return True, None
+
+
+def _cpp_tokens(code: str) -> Iterable[Tuple[str, str]]:
+    for match in CPP_TOKEN_PATTERN.finditer(code):
+        kind = match.lastgroup
+        if kind in ("comment", "string", "delim"):
+            continue
+        if kind in ("include", "header"):
+            yield "include", match.group("header").strip()
+        else:
+            yield kind, match.group(kind)
+
+
+def analyze_cpp(code: str) -> Verdict:
+    tokens = list(_cpp_tokens(code))
+
+    for index, (kind, value) in enumerate(tokens):
+        if kind == "include":
+            if value in CPP_BLOCKED_HEADERS or value.startswith(
+                CPP_BLOCKED_HEADER_PREFIXES
+            ):
+                return False, f"Blocked header: <{value}>"
+            continue
+
+        if kind != "identifier":
+            continue
+
+        if value in CPP_BLOCKED_IDENTIFIERS:
+            return False, f"Blocked identifier: {value}"
+
+        following = tokens[index + 1][1] if index + 1 < len(tokens) else ""
+        previous = tokens[index - 1][1] if index > 0 else ""
+        if following == "(" and previous not in (".", ">") and value in CPP_BLOCKED_CALLS:
+            return False, f"Blocked call: {value}()"
+
+    return True, None
+
+
+class _VerdictCache:
+    """Bounded LRU of verdicts keyed by a hash of (language, code)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._verdicts: "OrderedDict[str, Verdict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Verdict]:
+        with self._lock:
+            verdict = self._verdicts.get(key)
+            if verdict is None:
+                self.misses += 1
+                return None
+            self._verdicts.move_to_end(key)
+            self.hits += 1
+            return verdict
+
+    def set(self, key: str, verdict: Verdict) -> None:
+        with self._lock:
+            self._verdicts[key] = verdict
+            self._verdicts.move_to_end(key)
+            while len(self._verdicts) > self.max_entries:
+                self._verdicts.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._verdicts),
+                "max_entries": self.max_entries,
+            }
+
+
+_verdict_cache = _VerdictCache(STATIC_ANALYSIS_CACHE_SIZE)
+
+ANALYZERS = {
+    "python": analyze_python,
+    "cpp": analyze_cpp,
+}
+
+
+def analyze_code(language: str, code: str) -> Verdict:
+    """
+    Returns:
+        (True, None) if the code passes the policy
+        (False, reason) otherwise
+    """
+    analyzer = ANALYZERS.get(language)
+    if analyzer is None:
+        return True, None
+
+    key = hashlib.sha256(f"{language}\0{code}".encode("utf-8")).hexdigest()
+    verdict = _verdict_cache.get(key)
+    if verdict is None:
+        verdict = analyzer(code)
+        _verdict_cache.set(key, verdict)
+
+    return verdict
+
+
+def analysis_stats() -> dict:
+    return _verdict_cache.stats()
@@ -111,6 +111,92 @@ greet("World")
         print(f"❌ Quick fix test failed: {str(e)}")
 
 
+def test_auto_retry_stream():
+    """Test the streaming auto-retry endpoint (server-sent events)."""
+
+    buggy_code = """
+numbers = [1, 2, 3]
+print(numbers[3])
+"""
+
+    print("\n📡 Testing Streaming Auto-Retry...")
+    print("=" * 60)
+
+    payload = {"language": "python", "code": buggy_code, "max_attempts": 3}
+
+    try:
+        start_time = time.time()
+        with requests.post(
+            f"{BASE_URL}/auto-retry/stream", json=payload, stream=True
+        ) as response:
+            if response.status_code != 200:
+                print(f"❌ Error: {response.status_code} - {response.text}")
+                return
+
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+
+                event = json.loads(line[len("data: ") :])
+                elapsed = time.time() - start_time
+
+                if event["event"] == "session":
+                    print(f"🆔 [{elapsed:.2f}s] Session ID: {event['session_id']}")
+                elif event["event"] == "execution":
+                    status = "✅" if event["execution_result"]["success"] else "❌"
+                    print(
+                        f"{status} [{elapsed:.2f}s] Attempt {event['attempt_number']} executed"
+                    )
+                elif event["event"] == "attempt":
+                    ai_fix = event["attempt"]["ai_fix"]
+                    if ai_fix:
+                        print(f"🤖 [{elapsed:.2f}s] AI Fix: {ai_fix['explanation']}")
+                elif event["event"] == "complete":
+                    print(f"🎯 [{elapsed:.2f}s] Success: {event['session']['success']}")
+                elif event["event"] == "error":
+                    print(f"❌ {event['detail']}")
+
+    except requests.exceptions.ConnectionError:
+        print("❌ Could not connect to backend.")
+    except Exception as e:
+        print(f"❌ Streaming test failed: {str(e)}")
+
+
+def test_single_provider_loop():
+    """
+    With one provider, a fix that only brings back the failing code
+    cannot be escalated: the session stops as a loop and keeps the
+    provider's explanation. Needs a server started with LLM_PROVIDERS=stub,
+    whose "fix" is the submitted code unchanged.
+    """
+
+    print("\n🔁 Testing loop detection with a single provider...")
+    print("=" * 60)
+
+    try:
+        stats = requests.get(f"{BASE_URL}/stats").json()
+        if stats["llm_router"]["order"] != ["stub"]:
+            print("⏭️  Skipped: start the server with LLM_PROVIDERS=stub")
+            return
+
+        payload = {"language": "python", "code": "print(1 / 0)\n", "max_attempts": 4}
+        result = requests.post(f"{BASE_URL}/auto-retry", json=payload).json()
+
+        first = result["attempts"][0]
+        print(f"🛑 Stop reason: {result['stop_reason']}")
+        print(f"🔄 Attempts: {result['total_attempts']}")
+
+        assert result["stop_reason"] == "loop_detected"
+        assert result["total_attempts"] == 1
+        assert first["escalated"] == "repeated_fix"
+        assert first["ai_fix"]["repeated"] is True
+        assert first["ai_fix"]["explanation"]
+        print("✅ Loop reported with the provider's explanation")
+
+    except requests.exceptions.ConnectionError:
+        print("❌ Could not connect to backend.")
+
+
 def test_session_management():
     """Test session management endpoints."""
 
@@ -220,6 +306,8 @@ if __name__ == "__main__":
     # Run all tests
     test_quick_fix()
     test_auto_retry_python()
+    test_auto_retry_stream()
+    test_single_provider_loop()
     test_session_management()
 
     print("\n" + "=" * 80)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import requests
+
+
+def test_batch_execute_api():
+    solution = """
+#include <iostream>
+using namespace std;
+
+int main() {
+    long long a, b;
+    cin >> a >> b;
+    cout << a + b << endl;
+    return 0;
+}
+"""
+
+    cases = [(f"{i} {i * 3}", str(i * 4)) for i in range(10)]
+    cases.append(("1 1", "3"))  # deliberately wrong expectation
+
+    url = "http://127.0.0.1:8000/api/batch-execute"
+    payload = {
+        "language": "cpp",
+        "items": [
+            {"code": solution, "stdin": stdin, "expected_stdout": expected}
+            for stdin, expected in cases
+        ],
+    }
+
+    print("Testing Batch Execution API...")
+    print("=" * 50)
+    print(f"URL: {url}")
+    print(f"Cases: {len(cases)}")
+    print("=" * 50)
+
+    try:
+        response = requests.post(url, json=payload, timeout=60)
+
+        if response.status_code == 200:
+            result = response.json()
+
+            print("API Response Success!")
+            print(f"Summary: {result['summary']}")
+            print(f"Distinct programs: {len(result['programs'])}")
+            print(f"Compile time: {result['programs'][0]['compile_time']:.2f}s")
+            print(f"Total time: {result['total_time']:.2f}s")
+
+            for case in result["results"]:
+                print(
+                    f"   #{case['index']}: {case['verdict']} "
+                    f"(run {case['run_time'] * 1000:.1f}ms, "
+                    f"queued {case['queue_wait_time'] * 1000:.1f}ms)"
+                )
+
+            assert result["summary"].get("accepted") == 10
+            assert result["summary"].get("wrong_answer") == 1
+            assert len(result["programs"]) == 1
+
+        else:
+            print(f"API Error: {response.status_code}")
+            print(f"Response: {response.text}")
+
+    except requests.exceptions.ConnectionError:
+        print("Connection Error - Is the backend server running?")
+        print("   Start with: cd backend && uvicorn main:app --reload")
+
+
+if __name__ == "__main__":
+    test_batch_execute_api()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Disconnects from /api/debug/stream in the middle of the explanation and
+checks that the server releases the request: admission goes back to idle
+and the next stream completes.
+
+Start the server with a slow stub provider, e.g.:
+    LLM_PROVIDERS=stub LLM_STUB_DELAY=0.5 uvicorn main:app
+"""
+
+import time
+
+import requests
+
+BASE_URL = "http://127.0.0.1:8000/api"
+PAYLOAD = {"language": "python", "code": "print(undefined_name)\n"}
+
+
+def read_events(response):
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: ") :]
+        elif line.startswith("data: "):
+            yield event
+
+
+def test_stream_disconnect():
+    print("Testing client disconnect during /debug/stream...")
+    print("=" * 50)
+
+    try:
+        with requests.post(
+            f"{BASE_URL}/debug/stream", json=PAYLOAD, stream=True, timeout=30
+        ) as response:
+            assert response.status_code == 200, response.text
+            for event in read_events(response):
+                print(f"   received {event}")
+                if event == "explanation":
+                    break
+        print("Disconnected mid-explanation")
+
+        deadline = time.monotonic() + 15
+        while True:
+            stats = requests.get(f"{BASE_URL}/stats", timeout=10).json()
+            if stats["admission"]["active"] == 0:
+                break
+            assert time.monotonic() < deadline, f"Still busy: {stats['admission']}"
+            time.sleep(0.2)
+        print(f"Admission idle again: {stats['admission']}")
+
+        with requests.post(
+            f"{BASE_URL}/debug/stream", json=PAYLOAD, stream=True, timeout=60
+        ) as response:
+            events = list(read_events(response))
+        print(f"Next stream: {events}")
+        assert events[-2:] == ["fix", "complete"], events
+
+        print("Disconnect test passed")
+
+    except requests.exceptions.ConnectionError:
+        print("Connection Error - Is the backend server running?")
+        print("   Start with: cd backend && uvicorn main:app --reload")
+
+
+if __name__ == "__main__":
+    test_stream_disconnect()